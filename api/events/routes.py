@@ -0,0 +1,58 @@
+# api/events/routes.py
+import asyncio
+import json
+import os
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, Request
+from fastapi.responses import StreamingResponse
+
+from auth.session import Session, get_session
+from workers.event_hub import event_hub
+
+# Comment line sent on an idle stream so proxies keep the connection open.
+EVENTS_KEEPALIVE_SECONDS = float(os.getenv("EVENTS_KEEPALIVE_SECONDS", "15"))
+
+router = APIRouter(tags=["Events"])
+
+
+def _format(event) -> str:
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
+
+
+@router.get("/events")
+async def events(
+    request: Request,
+    session: Session = Depends(get_session),
+    last_event_id: Optional[str] = Header(None),
+):
+    """
+    Server-Sent Events stream of the user's events (e.g. `reminder`).
+    Reconnect with Last-Event-ID to be replayed what was missed.
+    """
+    try:
+        after = int(last_event_id) if last_event_id else None
+    except ValueError:
+        after = None
+    sub = event_hub.subscribe(session.user_id, after)
+
+    async def stream():
+        try:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(sub.queue.get(), EVENTS_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if event is None:
+                    break
+                yield _format(event)
+        finally:
+            event_hub.unsubscribe(sub)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,55 +1,75 @@
 # api/profile/routes.py
-from fastapi import APIRouter, HTTPException, Depends
-from memory.long_term import MemoryService, UserService
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, Response
+from memory.async_services import AsyncMemoryService
+from memory.profile_cache import PROFILE_FIELDS, PROFILE_MODE, profile_cache
 from api.profile.schemas import ProfileResponse, UpdateProfileRequest
-from auth.guard import get_user
+from auth.session import Session, get_session
 
 router = APIRouter(prefix="/profile", tags=["Profile"])
 
-@router.get("/", response_model=ProfileResponse)
-def get_profile(username: str = Depends(get_user)):
-    user_id = UserService.get_user_id(username)
-    if not user_id:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    fullName = MemoryService.recall(user_id, "Profile", "fullName") or ""
-    email = MemoryService.recall(user_id, "Profile", "email") or ""
-    aiPersonality = MemoryService.recall(user_id, "Profile", "aiPersonality") or ""
-    preferences = MemoryService.recall(user_id, "Profile", "preferences") or ""
-    raw = MemoryService.recall(user_id, "Profile", "notificationsEnabled")
+
+def _parse_notifications(raw) -> bool:
     if raw is None or raw == "":
-        notificationsEnabled = True
-    elif isinstance(raw, bool):
-        notificationsEnabled = raw
-    else:
-        notificationsEnabled = str(raw).strip().lower() in ("true", "1", "yes", "y", "on")
+        return True
+    if isinstance(raw, bool):
+        return raw
+    return str(raw).strip().lower() in ("true", "1", "yes", "y", "on")
+
+
+async def _load_profile(user_id: int):
+    """(profile dict, etag), from the cache or one batched read."""
+    cached = profile_cache.get(user_id)
+    if cached is not None:
+        return cached
+    # Taken before the read: if an update lands meanwhile, this (older)
+    # profile is not cached over it.
+    generation = profile_cache.generation()
+    values = await AsyncMemoryService.recall_many(user_id, PROFILE_MODE, list(PROFILE_FIELDS))
+    profile = {
+        "fullName": values.get("fullName") or "",
+        "email": values.get("email") or "",
+        "aiPersonality": values.get("aiPersonality") or "",
+        "preferences": values.get("preferences") or "",
+        "notificationsEnabled": _parse_notifications(values.get("notificationsEnabled")),
+    }
+    return profile, profile_cache.put(user_id, profile, generation)
 
 
-    return ProfileResponse(
-        fullName=fullName,
-        email=email,
-        aiPersonality=aiPersonality,
-        preferences=preferences,
-        notificationsEnabled=notificationsEnabled
-    )
+@router.get("/", response_model=ProfileResponse)
+async def get_profile(
+    response: Response,
+    session: Session = Depends(get_session),
+    if_none_match: Optional[str] = Header(None),
+):
+    profile, etag = await _load_profile(session.user_id)
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    response.headers["ETag"] = etag
+    return ProfileResponse(**profile)
 
 @router.post("/update", response_model=ProfileResponse)
-def update_profile(req: UpdateProfileRequest, username: str = Depends(get_user)):
-    user = UserService.get_user(username)
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    user_id = user["id"]
-
-    MemoryService.remember(user_id, "Profile", "fullName", req.fullName)
-    MemoryService.remember(user_id, "Profile", "email", req.email)
-    MemoryService.remember(user_id, "Profile", "aiPersonality", req.aiPersonality)
-    MemoryService.remember(user_id, "Profile", "preferences", req.preferences)
-    MemoryService.remember(user_id, "Profile", "notificationsEnabled", str(req.notificationsEnabled))
-
-    return ProfileResponse(
-        fullName=req.fullName,
-        email=req.email,
-        aiPersonality=req.aiPersonality,
-        preferences=req.preferences,
-        notificationsEnabled=req.notificationsEnabled
-    )
+async def update_profile(req: UpdateProfileRequest, response: Response, session: Session = Depends(get_session)):
+    user_id = session.user_id
+
+    # One statement, one transaction for the whole profile.
+    await AsyncMemoryService.remember_many(user_id, PROFILE_MODE, {
+        "fullName": req.fullName,
+        "email": req.email,
+        "aiPersonality": req.aiPersonality,
+        "preferences": req.preferences,
+        "notificationsEnabled": str(req.notificationsEnabled),
+    })
+    # After the write's own invalidation; a later update wins over this one.
+    generation = profile_cache.generation()
+
+    profile = {
+        "fullName": req.fullName,
+        "email": req.email,
+        "aiPersonality": req.aiPersonality,
+        "preferences": req.preferences,
+        "notificationsEnabled": req.notificationsEnabled,
+    }
+    response.headers["ETag"] = profile_cache.put(user_id, profile, generation)
+    return ProfileResponse(**profile)
@@ -1,16 +1,21 @@
 # api/routes.py
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from typing import Dict
-
-from auth.guard import get_user
-from auth.tokens import create_token
+from typing import Dict, Optional
+
+from auth.guard import get_user, oauth2
+from auth.hashing import HashingBusy
+from auth.rate_limit import check_login_rate, too_many_requests
+from auth.session import Session, get_session, session_cache, set_session_mode
+from auth.token_cache import token_cache
+from auth.tokens import create_token, decode_token
 from models.chat_request import ChatRequest
 from models.chat_response import ChatResponse
 from models.user import LoginRequest
 from api.schemas import ModeRequest
 from brain.director import process_input
-from memory.long_term import UserService
+from memory.async_services import AsyncUserService
 from memory.short_term import EphemeralService
 
 router = APIRouter()
@@ -27,38 +32,43 @@ AVAILABLE_MODES: Dict[str, Mode] = {
     "VIP": Mode(name="VIP", description="Philosophical, conversational, creative mode", temperature=0.8, max_tokens=400),
 }
 
-user_modes: Dict[int, str] = {}
-
-def get_user_mode(user_id: int) -> Mode:
-    mode_name = user_modes.get(user_id, "Secretary")
-    mode = AVAILABLE_MODES.get(mode_name) or AVAILABLE_MODES["Secretary"]
-    user_modes[user_id] = mode.name
-    return mode
+def get_user_mode(mode_name: Optional[str]) -> Mode:
+    """The session's mode; Secretary until the user picks one."""
+    return AVAILABLE_MODES.get(mode_name or "Secretary") or AVAILABLE_MODES["Secretary"]
 
 @router.post("/login")
-def login(req: LoginRequest, stay_logged_in: bool = False):
+async def login(req: LoginRequest, request: Request, stay_logged_in: bool = False):
     if not req.password:
         raise HTTPException(status_code=400, detail="Password required")
-
-    user = UserService.get_user(req.username)
-    if not user or not UserService.verify_user(req.username, req.password):
+    check_login_rate(request, req.username)
+
+    user = await AsyncUserService.get_user(req.username)
+    try:
+        verified = bool(user) and await AsyncUserService.verify_user(req.username, req.password)
+    except HashingBusy:
+        raise too_many_requests(1)
+    if not verified:
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
 
 @router.post("/signup")
-def signup(req: LoginRequest, stay_logged_in: bool = False):
+async def signup(req: LoginRequest, request: Request, stay_logged_in: bool = False):
     if not req.password:
         raise HTTPException(status_code=400, detail="Password required")
+    check_login_rate(request, req.username)
 
-    existing = UserService.get_user(req.username)
+    existing = await AsyncUserService.get_user(req.username)
     if existing:
         raise HTTPException(status_code=400, detail="User already exists")
 
-    user = UserService.create_user(req.username, req.password)
+    try:
+        user = await AsyncUserService.create_user(req.username, req.password)
+    except HashingBusy:
+        raise too_many_requests(1)
     if not user:
         raise HTTPException(status_code=500, detail="Failed to create user")
 
-    user_modes[user["id"]] = "Secretary"
+    session_cache.put(Session(user_id=user["id"], username=user["username"], mode=None))
     token = create_token(req.username, long_lived=stay_logged_in)
 
     return {
@@ -68,27 +78,24 @@ def signup(req: LoginRequest, stay_logged_in: bool = False):
         "is_new_user": True
     }
 
-@router.post("/chat", response_model=ChatResponse)
-def chat(req: ChatRequest, username: str = Depends(get_user)):
-    user = UserService.get_user(username)
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    user_id = user["id"]
+@router.post("/logout")
+async def logout(token: str = Depends(oauth2), username: str = Depends(get_user)):
+    payload = token_cache.get(token) or decode_token(token) or {}
+    token_cache.revoke(token, payload.get("exp"))
+    return {"status": "ok"}
 
-    mode = get_user_mode(user_id)
-    ai_text = process_input(user_id, mode.model_dump(), req.message)
+@router.post("/chat", response_model=ChatResponse)
+async def chat(req: ChatRequest, session: Session = Depends(get_session)):
+    mode = get_user_mode(session.mode)
+    # The responder makes blocking OpenAI calls, so it runs on the threadpool.
+    ai_text = await run_in_threadpool(process_input, session.user_id, mode.model_dump(), req.message)
     return ChatResponse(response=ai_text)
 
 @router.post("/mode")
-def change_mode(req: ModeRequest, username: str = Depends(get_user)):
-    user = UserService.get_user(username)
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    user_id = user["id"]
-
+async def change_mode(req: ModeRequest, session: Session = Depends(get_session)):
     if req.mode not in AVAILABLE_MODES:
         raise HTTPException(status_code=400, detail=f"Mode '{req.mode}' not found. Available: {list(AVAILABLE_MODES.keys())}")
 
-    user_modes[user_id] = req.mode
-    EphemeralService.forget(user_id)
+    await set_session_mode(session, req.mode)
+    EphemeralService.forget(session.user_id)
     return {"status": "ok", "mode": req.mode}
@@ -2,28 +2,42 @@
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from auth.token_cache import token_cache
 from auth.tokens import decode_token
 from jose import ExpiredSignatureError
 
 # Use the full API path for login
 oauth2 = OAuth2PasswordBearer(tokenUrl="/login")
 
-def get_user(token: str = Depends(oauth2)) -> str:
+async def get_user(token: str = Depends(oauth2)) -> str:
     """
-    Extract username from JWT token.
+    Extract username from JWT token. Decoding is cheap CPU work, so this runs
+    on the event loop rather than taking a threadpool thread per request;
+    verified payloads are reused from auth.token_cache until the token expires.
 
     Raises:
         HTTPException 401 if token is invalid or expired.
     """
     try:
-        payload = decode_token(token)
-        if not payload or "sub" not in payload:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid token",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
+        payload = token_cache.get(token)
+        if payload is None:
+            if token_cache.is_revoked(token):
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="Token revoked",
+                    headers={"WWW-Authenticate": "Bearer"},
+                )
+            payload = decode_token(token)
+            if not payload or "sub" not in payload:
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="Invalid token",
+                    headers={"WWW-Authenticate": "Bearer"},
+                )
+            token_cache.put(token, payload)
         return payload["sub"]
+    except HTTPException:
+        raise
     except ExpiredSignatureError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
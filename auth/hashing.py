@@ -0,0 +1,78 @@
+# auth/hashing.py
+"""
+Password hashing off the request path.
+
+argon2 is deliberately CPU- and memory-heavy, so hashing and verification run
+in a dedicated pool of HASH_WORKERS processes: a burst of logins or signups
+cannot take threads or GIL time from /chat. At most HASH_WORKERS +
+HASH_QUEUE_LIMIT jobs are admitted at once; beyond that the calls raise
+HashingBusy and the routes answer 429 instead of queueing without bound.
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Optional, Tuple
+
+from auth.tokens import hash_password, verify_and_update_password
+
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", "2"))
+HASH_QUEUE_LIMIT = int(os.getenv("HASH_QUEUE_LIMIT", "16"))
+
+
+class HashingBusy(Exception):
+    """Every hashing slot is taken; try again later."""
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+_in_flight = 0
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=HASH_WORKERS)
+        return _pool
+
+
+def _admit():
+    global _in_flight
+    with _pool_lock:
+        if _in_flight >= HASH_WORKERS + HASH_QUEUE_LIMIT:
+            raise HashingBusy()
+        _in_flight += 1
+
+
+def _release():
+    global _in_flight
+    with _pool_lock:
+        _in_flight -= 1
+
+
+async def _run(fn: Callable[..., Any], *args) -> Any:
+    _admit()
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_pool(), fn, *args)
+    finally:
+        _release()
+
+
+async def hash_password_async(password: str) -> str:
+    """hash_password in the pool. Raises HashingBusy when saturated."""
+    return await _run(hash_password, password)
+
+
+async def verify_password_async(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    """verify_and_update_password in the pool. Raises HashingBusy when saturated."""
+    return await _run(verify_and_update_password, password, hashed)
+
+
+def shutdown_hashing():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True)
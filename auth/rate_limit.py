@@ -0,0 +1,90 @@
+# auth/rate_limit.py
+"""
+Token-bucket admission for the password endpoints (/login, /signup).
+
+Each client IP and each username gets a bucket that refills at
+LOGIN_RATE_PER_MINUTE_{IP,USER} and holds up to LOGIN_BURST_{IP,USER}
+attempts. An empty bucket answers 429 with Retry-After before any argon2 work
+is queued. Buckets are per process and the least recently used are dropped
+beyond RATE_LIMIT_MAX_KEYS.
+"""
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, Request, status
+
+LOGIN_RATE_PER_MINUTE_IP = float(os.getenv("LOGIN_RATE_PER_MINUTE_IP", "30"))
+LOGIN_BURST_IP = float(os.getenv("LOGIN_BURST_IP", "10"))
+LOGIN_RATE_PER_MINUTE_USER = float(os.getenv("LOGIN_RATE_PER_MINUTE_USER", "10"))
+LOGIN_BURST_USER = float(os.getenv("LOGIN_BURST_USER", "5"))
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+# Take the client address from X-Forwarded-For (only behind a trusted proxy).
+RATE_LIMIT_TRUST_PROXY = os.getenv("RATE_LIMIT_TRUST_PROXY", "0") == "1"
+
+
+class RateLimiter:
+    def __init__(self, rate_per_minute: float, burst: float, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.max_keys = max_keys
+        # key -> (tokens, last refill)
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str) -> float:
+        """Take one token for key. 0 if allowed, else seconds until one is available."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                wait = 0.0
+            else:
+                self._buckets[key] = (tokens, now)
+                wait = (1 - tokens) / self.rate if self.rate > 0 else 60.0
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return wait
+
+    def reset(self, key: Optional[str] = None):
+        with self._lock:
+            if key is None:
+                self._buckets.clear()
+            else:
+                self._buckets.pop(key, None)
+
+
+ip_limiter = RateLimiter(LOGIN_RATE_PER_MINUTE_IP, LOGIN_BURST_IP)
+user_limiter = RateLimiter(LOGIN_RATE_PER_MINUTE_USER, LOGIN_BURST_USER)
+
+
+def client_ip(request: Request) -> str:
+    if RATE_LIMIT_TRUST_PROXY:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+def too_many_requests(retry_after: float) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Too many attempts, try again later",
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+def check_login_rate(request: Request, username: str):
+    """
+    Raises:
+        HTTPException 429 if the client IP or the username is out of attempts.
+    """
+    wait = max(ip_limiter.acquire(client_ip(request)), user_limiter.acquire((username or "").lower()))
+    if wait > 0:
+        raise too_many_requests(wait)
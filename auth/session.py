@@ -0,0 +1,104 @@
+# auth/session.py
+"""
+Per-user sessions: token subject -> user id -> active mode in one lookup.
+
+get_session resolves the username from the JWT (auth.guard.get_user) to the
+user's id and persisted mode (users.mode). Resolved sessions are cached per
+subject for SESSION_CACHE_TTL_SECONDS, so a warm request does no database
+work. Mode changes are written to the users table and update this worker's
+entry immediately; other workers see them once their entry expires.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional, Tuple
+
+from fastapi import Depends, HTTPException
+
+from auth.guard import get_user
+from memory.async_services import AsyncUserService
+
+SESSION_CACHE_TTL_SECONDS = float(os.getenv("SESSION_CACHE_TTL_SECONDS", "60"))
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "10000"))
+
+
+class Session(NamedTuple):
+    user_id: int
+    username: str
+    mode: Optional[str]
+
+
+class SessionCache:
+    def __init__(self, max_entries: int = SESSION_CACHE_SIZE, ttl: float = SESSION_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[Session, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, username: str) -> Optional[Session]:
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is None:
+                return None
+            if entry[1] < time.monotonic():
+                del self._entries[username]
+                return None
+            self._entries.move_to_end(username)
+            return entry[0]
+
+    def put(self, session: Session):
+        with self._lock:
+            self._entries[session.username] = (session, time.monotonic() + self.ttl)
+            self._entries.move_to_end(session.username)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def set_mode(self, username: str, mode: str):
+        """Update a cached session's mode in place (keeps its expiry)."""
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is not None:
+                self._entries[username] = (entry[0]._replace(mode=mode), entry[1])
+
+    def invalidate(self, username: Optional[str] = None):
+        with self._lock:
+            if username is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(username, None)
+
+
+session_cache = SessionCache()
+
+
+async def load_session(username: str) -> Optional[Session]:
+    """The cached session for username, loading it on a miss; None if there is no such user."""
+    session = session_cache.get(username)
+    if session is not None:
+        return session
+    user = await AsyncUserService.get_user(username)
+    if not user:
+        return None
+    session = Session(user_id=user["id"], username=user["username"], mode=user.get("mode"))
+    session_cache.put(session)
+    return session
+
+
+async def get_session(username: str = Depends(get_user)) -> Session:
+    """
+    Dependency for authenticated routes.
+
+    Raises:
+        HTTPException 404 if the token's user no longer exists.
+    """
+    session = await load_session(username)
+    if session is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return session
+
+
+async def set_session_mode(session: Session, mode: str):
+    """Persist the user's active mode and update the cached session."""
+    await AsyncUserService.set_mode(session.user_id, mode)
+    session_cache.set_mode(session.username, mode)
@@ -0,0 +1,118 @@
+# auth/token_cache.py
+"""
+Bounded LRU of verified JWT payloads, keyed by sha256(token).
+
+Clients send the same bearer token on every request, so auth.guard.get_user
+verifies a token once and then serves its payload from here. An entry never
+outlives the token's `exp` (nor TOKEN_CACHE_TTL_SECONDS). revoke() drops a
+token and refuses it until it expires (logout); invalidate() drops everything
+or one subject's tokens (key rotation, deleted users). Revocations are held
+per process.
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+TOKEN_CACHE_TTL_SECONDS = float(os.getenv("TOKEN_CACHE_TTL_SECONDS", "3600"))
+
+
+def token_digest(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+class TokenCache:
+    def __init__(self, max_entries: int = TOKEN_CACHE_SIZE, ttl: float = TOKEN_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        # digest -> exp of revoked tokens, kept until they would expire anyway.
+        self._revoked: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.rejected = 0
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        """The cached payload, or None if the token has to be decoded."""
+        digest = token_digest(token)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None:
+                if entry[1] > now:
+                    self._entries.move_to_end(digest)
+                    self.hits += 1
+                    return entry[0]
+                del self._entries[digest]
+            self.misses += 1
+            return None
+
+    def put(self, token: str, payload: Dict[str, Any]):
+        exp = payload.get("exp")
+        now = time.time()
+        expires_at = now + self.ttl
+        if isinstance(exp, (int, float)):
+            expires_at = min(expires_at, float(exp))
+        if expires_at <= now:
+            return
+        digest = token_digest(token)
+        with self._lock:
+            if digest in self._revoked:
+                return
+            self._entries[digest] = (payload, expires_at)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def is_revoked(self, token: str) -> bool:
+        digest = token_digest(token)
+        with self._lock:
+            exp = self._revoked.get(digest)
+            if exp is None:
+                return False
+            if exp <= time.time():
+                del self._revoked[digest]
+                return False
+            self.rejected += 1
+            return True
+
+    def revoke(self, token: str, exp: Optional[float] = None):
+        """Drop token and refuse it until exp (default: TOKEN_CACHE_TTL_SECONDS from now)."""
+        digest = token_digest(token)
+        now = time.time()
+        with self._lock:
+            self._entries.pop(digest, None)
+            for stale in [d for d, until in self._revoked.items() if until <= now]:
+                del self._revoked[stale]
+            self._revoked[digest] = float(exp) if exp is not None else now + self.ttl
+
+    def invalidate(self, subject: Optional[str] = None):
+        """Drop every cached token, or those of one subject."""
+        with self._lock:
+            if subject is None:
+                self._entries.clear()
+            else:
+                for digest in [d for d, (p, _) in self._entries.items() if p.get("sub") == subject]:
+                    del self._entries[digest]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "revoked": len(self._revoked),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "rejected": self.rejected,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+token_cache = TokenCache()
@@ -3,7 +3,7 @@
 import os
 import secrets
 from datetime import datetime, timedelta, timezone
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 
 from jose import jwt, JWTError
 from passlib.context import CryptContext
@@ -30,7 +30,19 @@ ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", str(6
 # Optional long-lived token (stay logged in): 30 days
 LONG_TOKEN_EXPIRE_DAYS = int(os.getenv("LONG_TOKEN_EXPIRE_DAYS", "30"))
 
-pwd = CryptContext(schemes=["argon2"], deprecated="auto")
+# argon2 cost parameters. Stored hashes made with other values are upgraded
+# on the user's next successful login (see verify_and_update_password).
+ARGON2_TIME_COST = int(os.getenv("ARGON2_TIME_COST", "3"))
+ARGON2_MEMORY_KIB = int(os.getenv("ARGON2_MEMORY_KIB", "65536"))
+ARGON2_PARALLELISM = int(os.getenv("ARGON2_PARALLELISM", "4"))
+
+pwd = CryptContext(
+    schemes=["argon2"],
+    deprecated="auto",
+    argon2__rounds=ARGON2_TIME_COST,
+    argon2__memory_cost=ARGON2_MEMORY_KIB,
+    argon2__parallelism=ARGON2_PARALLELISM,
+)
 
 
 # -------------------------------------------------------------------
@@ -55,6 +67,19 @@ def verify_password(password: str, hashed: str) -> bool:
         return False
 
 
+def verify_and_update_password(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verify a password; on success also return a new hash if the stored one
+    was made with outdated argon2 parameters (else None).
+    """
+    if not password or not hashed:
+        return False, None
+    try:
+        return pwd.verify_and_update(password, hashed)
+    except Exception:
+        return False, None
+
+
 # -------------------------------------------------------------------
 # Token Utilities
 # -------------------------------------------------------------------
@@ -12,9 +12,9 @@ from memory.summariser import summarize_memory
 from brain.persona import SYSTEM_PROMPTS, Mode
 from brain.critic import review_response
 
-from learning.embedder import embed_text
+from db.unit_of_work import UnitOfWork
 from learning.memory_ranker import top_k_relevant_messages
-from memory.vector_store import add_message
+from workers.vector_writer import vector_writer
 
 openai.api_key = os.getenv("OPENAI_API_KEY")
 
@@ -34,14 +34,19 @@ def _clear_pending_reminder(user_id):
     ]
 
 def generate_response(user_id, mode, user_input: str) -> str:
+    # Everything the turn writes is committed together when it ends.
+    with UnitOfWork():
+        return _generate_response(user_id, mode, user_input)
+
+def _generate_response(user_id, mode, user_input: str) -> str:
     if isinstance(mode, dict):
         mode = Mode(**mode)
 
     EphemeralService.log(user_id, "User", user_input)
 
     # ---- store user turn in vector memory (hidden layer learns here) ----
-    uvec = embed_text(user_input)
-    add_message(user_id, "User", user_input, uvec)
+    # Embedding and the insert happen on the write-behind thread.
+    vector_writer.submit(user_id, "User", user_input, mode.name)
 
     lower_input = user_input.lower().strip()
 
@@ -60,14 +65,14 @@ def generate_response(user_id, mode, user_input: str) -> str:
                 _clear_pending_reminder(user_id)
                 reply = f"Excellent — I’ve set a reminder for **{pending['task']}** at **{pending['display_time']}**."
                 EphemeralService.log(user_id, "AI", reply)
-                add_message(user_id, "AI", reply, embed_text(reply))
+                vector_writer.submit(user_id, "AI", reply, mode.name)
                 return reply
 
             if any(normalized_input.startswith(kw) or f" {kw} " in f" {normalized_input} " for kw in negative_keywords):
                 _clear_pending_reminder(user_id)
                 reply = "Okay, I won’t set that reminder."
                 EphemeralService.log(user_id, "AI", reply)
-                add_message(user_id, "AI", reply, embed_text(reply))
+                vector_writer.submit(user_id, "AI", reply, mode.name)
                 return reply
 
         if any(kw in lower_input for kw in ["list reminders", "show reminders", "my reminders"]):
@@ -82,7 +87,7 @@ def generate_response(user_id, mode, user_input: str) -> str:
                 reply = "Here are your reminders:\n" + "\n".join(lines)
 
             EphemeralService.log(user_id, "AI", reply)
-            add_message(user_id, "AI", reply, embed_text(reply))
+            vector_writer.submit(user_id, "AI", reply, mode.name)
             return reply
 
         if any(kw in lower_input for kw in ["remind", "reminder"]):
@@ -90,7 +95,7 @@ def generate_response(user_id, mode, user_input: str) -> str:
             if not search_results:
                 reply = "When would you like me to remind you?"
                 EphemeralService.log(user_id, "AI", reply)
-                add_message(user_id, "AI", reply, embed_text(reply))
+                vector_writer.submit(user_id, "AI", reply, mode.name)
                 return reply
 
             matched_text, dt = max(search_results, key=lambda x: x[1])
@@ -102,7 +107,7 @@ def generate_response(user_id, mode, user_input: str) -> str:
             if not task:
                 reply = "What would you like me to be reminded about?"
                 EphemeralService.log(user_id, "AI", reply)
-                add_message(user_id, "AI", reply, embed_text(reply))
+                vector_writer.submit(user_id, "AI", reply, mode.name)
                 return reply
 
             iso_time = dt.isoformat()
@@ -111,7 +116,7 @@ def generate_response(user_id, mode, user_input: str) -> str:
 
             reply = f"Just to confirm — would you like a reminder for **{task}** at **{display_time}**?"
             EphemeralService.log(user_id, "AI", reply)
-            add_message(user_id, "AI", reply, embed_text(reply))
+            vector_writer.submit(user_id, "AI", reply, mode.name)
             return reply
 
     # =====================================================
@@ -120,8 +125,8 @@ def generate_response(user_id, mode, user_input: str) -> str:
     memory_summary = summarize_memory(user_id, mode.name)
     conversation_summary = EphemeralService.get_context(user_id, summarize=True)
 
-    # ---- NEW: retrieve top relevant past messages ----
-    top_mem = top_k_relevant_messages(user_id, user_input, k=8)
+    # ---- NEW: retrieve top relevant past messages (this mode only) ----
+    top_mem = top_k_relevant_messages(user_id, user_input, k=8, mode=mode.name)
     retrieved_block = ""
     if top_mem:
         lines = [f"- ({m['role']}, score={m['score']:.2f}) {m['content']}" for m in top_mem]
@@ -155,5 +160,5 @@ def generate_response(user_id, mode, user_input: str) -> str:
         pass
 
     EphemeralService.log(user_id, "AI", reply)
-    add_message(user_id, "AI", reply, embed_text(reply))
+    vector_writer.submit(user_id, "AI", reply, mode.name)
     return reply
@@ -0,0 +1 @@
+# db/__init__.py
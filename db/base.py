@@ -0,0 +1,128 @@
+# db/base.py
+"""
+Storage interface used by the memory services.
+
+A backend implements the four repositories below: users, long-term memory
+(key/value per user and mode), reminders, and the plain message transcript.
+Embedding storage and retrieval stay in memory.vector_store, which needs
+SQLite-specific features (BLOB columns, FTS5, memory-mapped shards).
+
+Writes from a backend may be deferred to the end of the active
+db.unit_of_work.UnitOfWork, so write methods return nothing unless the
+caller needs a generated id.
+"""
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+# (id, text, time, status, sort_time), as returned by list_reminders.
+ReminderRow = Tuple[int, str, Optional[str], str, Optional[str]]
+# (id, user_id, text, due_epoch, keep), as returned by upcoming_reminders
+# and take_due_reminders.
+ScheduledReminder = Tuple[int, int, str, float, bool]
+
+
+def reminder_epoch(time: Optional[str]) -> Optional[float]:
+    """
+    UTC epoch seconds of a reminder time, stored alongside it as due_epoch.
+    Times without an offset are server-local (what dateparser produces).
+    """
+    if not time:
+        return None
+    try:
+        return datetime.fromisoformat(time).timestamp()
+    except ValueError:
+        return None
+
+
+class Database(ABC):
+    name = ""
+
+    def init(self):
+        """Create or upgrade whatever the backend needs before first use."""
+
+    # ---- users ----
+    @abstractmethod
+    def create_user(self, username: str, hashed_password: str) -> Optional[Dict[str, Any]]:
+        """Store a user; None if the username is taken."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_user_by_username(self, username: str) -> Optional[Dict[str, Any]]:
+        """{"id", "username", "mode"}; mode is None until the user picks one."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def set_user_mode(self, user_id: int, mode: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_password_hash(self, username: str) -> Optional[str]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def set_password_hash(self, username: str, hashed_password: str):
+        raise NotImplementedError
+
+    # ---- long-term memory ----
+    @abstractmethod
+    def remember(self, user_id: int, mode: str, key: str, value: str, timestamp: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    def recall(self, user_id: int, mode: str, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def remember_many(self, user_id: int, mode: str, values: Dict[str, str], timestamp: str):
+        """Store several keys in one write."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def recall_many(self, user_id: int, mode: str, keys: List[str]) -> Dict[str, str]:
+        """Values of the keys that exist, in one read."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def list_memory(self, user_id: int, mode: str) -> List[Dict[str, Any]]:
+        """All of a user's entries for mode, oldest first."""
+        raise NotImplementedError
+
+    # ---- reminders ----
+    @abstractmethod
+    def add_reminder(self, user_id: int, text: str, time: Optional[str], keep: bool, created_at: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    def list_reminders(self, user_id: int, include_fired: bool = False) -> List[ReminderRow]:
+        """Pending (or all) reminders, ordered by time, falling back to created_at."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete_reminder(self, reminder_id: int):
+        raise NotImplementedError
+
+    @abstractmethod
+    def upcoming_reminders(self, limit: int) -> List[ScheduledReminder]:
+        """The first `limit` pending reminders with a time, across all users, earliest first."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def take_due_reminders(self, until_epoch: float, fired_at: str) -> List[ScheduledReminder]:
+        """
+        Claim every pending reminder due by until_epoch, across all users, and
+        return them: keep=1 rows become 'fired', the rest are deleted. Applied
+        immediately (outside any unit of work); a row is returned to one
+        caller only, even with several workers.
+        """
+        raise NotImplementedError
+
+    # ---- message transcript ----
+    @abstractmethod
+    def add_message(self, user_id: int, role: str, content: str, created_at: str, mode: Optional[str] = None):
+        raise NotImplementedError
+
+    @abstractmethod
+    def recent_messages(self, user_id: int, limit: int = 50, mode: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Newest messages first."""
+        raise NotImplementedError
@@ -0,0 +1,102 @@
+# db/connection.py
+"""
+Per-thread SQLite connections.
+
+Each thread keeps one open connection to DB_FILE instead of connecting for
+every query. Connections run in WAL mode, so readers never wait for a writer
+(e.g. the reminder worker's deletes), with synchronous=NORMAL and a busy
+timeout for writer/writer contention. Callers commit as before but must not
+close the connection; close_all() does that at shutdown.
+
+Because the connection outlives each query, a write path that fails must roll
+back: a transaction left open would keep holding the write lock for the
+thread's lifetime. db.unit_of_work additionally discards any such leftover
+(discard_open_transaction) before it starts its own.
+"""
+import os
+import sqlite3
+import threading
+from typing import Dict, Tuple
+
+DB_FILE = os.getenv("DB_FILE", "ai_memory.db")
+
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_CACHE_KIB = int(os.getenv("SQLITE_CACHE_KIB", "65536"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+_local = threading.local()
+# Every open connection by owning thread, so close_all() can reach them and
+# connections of threads that have exited are closed.
+_open: Dict[int, Tuple[threading.Thread, sqlite3.Connection]] = {}
+_open_lock = threading.Lock()
+# Bumped by close_all(), so threads reopen instead of using a closed handle.
+_epoch = 0
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, check_same_thread=False, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    conn.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_KIB}")
+    conn.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
+
+
+def get_conn() -> sqlite3.Connection:
+    """This thread's connection to DB_FILE, opened on first use."""
+    conn = getattr(_local, "conn", None)
+    if conn is not None and _local.key == (DB_FILE, _epoch):
+        return conn
+    if conn is not None:
+        _forget(threading.get_ident())
+    conn = _connect(DB_FILE)
+    _local.conn, _local.key = conn, (DB_FILE, _epoch)
+    thread = threading.current_thread()
+    with _open_lock:
+        for ident, (owner, stale) in list(_open.items()):
+            if not owner.is_alive():
+                del _open[ident]
+                stale.close()
+        _open[thread.ident] = (thread, conn)
+    return conn
+
+
+def discard_open_transaction(conn: sqlite3.Connection) -> bool:
+    """
+    Roll back a transaction an earlier failed write left open on conn.
+    True if there was one.
+    """
+    if not conn.in_transaction:
+        return False
+    conn.rollback()
+    return True
+
+
+def _forget(ident: int):
+    with _open_lock:
+        _, conn = _open.pop(ident, (None, None))
+    if conn is not None:
+        conn.close()
+
+
+def close_conn():
+    """Close this thread's connection (the next get_conn reopens it)."""
+    if getattr(_local, "conn", None) is not None:
+        _local.conn = None
+        _forget(threading.get_ident())
+
+
+def close_all():
+    """Close every thread's connection (app shutdown)."""
+    global _epoch
+    with _open_lock:
+        _epoch += 1
+        conns = [conn for _, conn in _open.values()]
+        _open.clear()
+    for conn in conns:
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
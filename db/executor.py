@@ -0,0 +1,39 @@
+# db/executor.py
+"""
+Bounded thread pool for SQLite work called from async code.
+
+`await run_db(fn, *args)` runs a blocking data-access call on one of
+DB_EXECUTOR_THREADS threads (each keeps its own connection, see
+db.connection) so the event loop never blocks on SQLite and the number of
+threads touching the database stays fixed however many requests are in
+flight. Only short database calls belong here; slow non-database work (LLM
+requests, password hashing) would hold up every other query.
+"""
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+DB_EXECUTOR_THREADS = int(os.getenv("DB_EXECUTOR_THREADS", "4"))
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=DB_EXECUTOR_THREADS, thread_name_prefix="db")
+    return _executor
+
+
+async def run_db(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), functools.partial(fn, *args, **kwargs))
+
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
@@ -0,0 +1,138 @@
+# db/memory_backend.py
+import itertools
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from db.base import Database, ReminderRow, ScheduledReminder, reminder_epoch
+
+
+class InMemoryDatabase(Database):
+    """
+    Process-local backend on plain dicts and lists, for tests and for
+    benchmarking the application layer without storage cost. Writes apply
+    immediately (no unit-of-work batching) and nothing survives a restart.
+    """
+
+    name = "memory"
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._user_ids = itertools.count(1)
+        self._reminder_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._users: Dict[str, Dict[str, Any]] = {}
+        self._usernames: Dict[int, str] = {}
+        self._memory: Dict[Tuple[int, str], Dict[str, Dict[str, Any]]] = {}
+        self._reminders: Dict[int, Dict[str, Any]] = {}
+        self._messages: Dict[int, List[Dict[str, Any]]] = {}
+
+    # ---- users ----
+    def create_user(self, username: str, hashed_password: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if username in self._users:
+                return None
+            user = {"id": next(self._user_ids), "username": username, "password_hash": hashed_password, "mode": None}
+            self._users[username] = user
+            self._usernames[user["id"]] = username
+            return {"id": user["id"], "username": username, "mode": None}
+
+    def get_user_by_username(self, username: str) -> Optional[Dict[str, Any]]:
+        user = self._users.get(username)
+        return {"id": user["id"], "username": user["username"], "mode": user["mode"]} if user else None
+
+    def set_user_mode(self, user_id: int, mode: str):
+        with self._lock:
+            username = self._usernames.get(user_id)
+            if username is not None:
+                self._users[username]["mode"] = mode
+
+    def get_password_hash(self, username: str) -> Optional[str]:
+        user = self._users.get(username)
+        return user["password_hash"] if user else None
+
+    def set_password_hash(self, username: str, hashed_password: str):
+        with self._lock:
+            user = self._users.get(username)
+            if user is not None:
+                user["password_hash"] = hashed_password
+
+    # ---- long-term memory ----
+    def remember(self, user_id: int, mode: str, key: str, value: str, timestamp: str):
+        with self._lock:
+            self._memory.setdefault((user_id, mode), {})[key] = {"key": key, "value": value, "timestamp": timestamp}
+
+    def remember_many(self, user_id: int, mode: str, values: Dict[str, str], timestamp: str):
+        with self._lock:
+            for key, value in values.items():
+                self.remember(user_id, mode, key, value, timestamp)
+
+    def recall_many(self, user_id: int, mode: str, keys: List[str]) -> Dict[str, str]:
+        entries = self._memory.get((user_id, mode), {})
+        return {key: entries[key]["value"] for key in keys if key in entries}
+
+    def recall(self, user_id: int, mode: str, key: str) -> Optional[str]:
+        entry = self._memory.get((user_id, mode), {}).get(key)
+        return entry["value"] if entry else None
+
+    def list_memory(self, user_id: int, mode: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            entries = list(self._memory.get((user_id, mode), {}).values())
+        return [dict(e) for e in sorted(entries, key=lambda e: e["timestamp"] or "")]
+
+    # ---- reminders ----
+    def add_reminder(self, user_id: int, text: str, time: Optional[str], keep: bool, created_at: str):
+        with self._lock:
+            reminder_id = next(self._reminder_ids)
+            self._reminders[reminder_id] = {
+                "id": reminder_id, "user_id": user_id, "text": text, "time": time,
+                "due_epoch": reminder_epoch(time), "keep": int(keep), "status": "pending",
+                "created_at": created_at,
+            }
+
+    def list_reminders(self, user_id: int, include_fired: bool = False) -> List[ReminderRow]:
+        with self._lock:
+            rows = [
+                (r["id"], r["text"], r["time"], r["status"], r["time"] or r["created_at"])
+                for r in self._reminders.values()
+                if r["user_id"] == user_id and (include_fired or r["status"] == "pending")
+            ]
+        return sorted(rows, key=lambda r: r[4] or "")
+
+    def delete_reminder(self, reminder_id: int):
+        with self._lock:
+            self._reminders.pop(reminder_id, None)
+
+    def upcoming_reminders(self, limit: int) -> List[ScheduledReminder]:
+        with self._lock:
+            rows = [
+                (r["id"], r["user_id"], r["text"], r["due_epoch"], bool(r["keep"]))
+                for r in self._reminders.values()
+                if r["status"] == "pending" and r["due_epoch"] is not None
+            ]
+        return sorted(rows, key=lambda r: r[3])[:limit]
+
+    def take_due_reminders(self, until_epoch: float, fired_at: str) -> List[ScheduledReminder]:
+        with self._lock:
+            due = [
+                r for r in self._reminders.values()
+                if r["status"] == "pending" and r["due_epoch"] is not None and r["due_epoch"] <= until_epoch
+            ]
+            for r in due:
+                if r["keep"]:
+                    r["status"], r["fired_at"] = "fired", fired_at
+                else:
+                    del self._reminders[r["id"]]
+        return sorted(((r["id"], r["user_id"], r["text"], r["due_epoch"], bool(r["keep"])) for r in due), key=lambda r: r[3])
+
+    # ---- message transcript ----
+    def add_message(self, user_id: int, role: str, content: str, created_at: str, mode: Optional[str] = None):
+        with self._lock:
+            self._messages.setdefault(user_id, []).append({
+                "id": next(self._message_ids), "role": role, "content": content,
+                "created_at": created_at, "mode": mode,
+            })
+
+    def recent_messages(self, user_id: int, limit: int = 50, mode: Optional[str] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = [m for m in reversed(self._messages.get(user_id, [])) if mode is None or m["mode"] == mode]
+        return [dict(m) for m in rows[:limit]]
@@ -0,0 +1,204 @@
+# db/migrations.py
+"""
+Versioned schema migrations.
+
+MIGRATIONS is an ordered list of (version, description, step). migrate()
+applies every step above the version recorded in schema_version, each in its
+own transaction, and records it. Steps are idempotent (IF NOT EXISTS, column
+checks), so databases created before versioning existed upgrade cleanly.
+
+Add new schema changes as a new step at the end; never edit an applied one.
+
+    python -m db.migrations            # apply pending migrations
+    python -m db.migrations --list     # show applied / pending
+    python -m db.migrations --to 3     # apply up to version 3
+"""
+import argparse
+import sqlite3
+from datetime import datetime
+from typing import Callable, List, Optional, Tuple
+
+from db.connection import get_conn
+
+
+def _ensure_column(cur, table: str, column: str, decl: str):
+    cur.execute(f"PRAGMA table_info({table})")
+    if column not in {row[1] for row in cur.fetchall()}:
+        cur.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+
+def _base_tables(cur):
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT UNIQUE,
+        password_hash TEXT
+    )
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS memory (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        mode TEXT,
+        key TEXT,
+        value TEXT,
+        timestamp TEXT,
+        UNIQUE(user_id, mode, key),
+        FOREIGN KEY(user_id) REFERENCES users(id)
+    )
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS reminders (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        text TEXT NOT NULL,
+        time TEXT,
+        keep INTEGER DEFAULT 0,
+        fired_at TEXT,
+        status TEXT DEFAULT 'pending',
+        created_at TEXT,
+        FOREIGN KEY(user_id) REFERENCES users(id)
+    )
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS memory_messages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        role TEXT NOT NULL,
+        content TEXT NOT NULL,
+        created_at TEXT NOT NULL,
+        embedding BLOB,
+        FOREIGN KEY(user_id) REFERENCES users(id)
+    )
+    """)
+
+
+def _vector_columns(cur):
+    _ensure_column(cur, "memory_messages", "embedding_dim", "INTEGER")
+    _ensure_column(cur, "memory_messages", "shard_row", "INTEGER")
+    _ensure_column(cur, "memory_messages", "embedding_q", "BLOB")
+    _ensure_column(cur, "memory_messages", "embedding_model", "TEXT")
+    _ensure_column(cur, "memory_messages", "embedding_version", "INTEGER")
+    _ensure_column(cur, "memory_messages", "mode", "TEXT")
+
+
+def _hot_path_indexes(cur):
+    # list_reminders / due-reminder sweeps: WHERE user_id=? AND status='pending'
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_reminders_user_status_time ON reminders(user_id, status, time)")
+    # list_memory: WHERE user_id=? AND mode=? ORDER BY timestamp
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_memory_user_mode_timestamp ON memory(user_id, mode, timestamp)")
+    # Per-user retrieval scans, newest first.
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_memory_messages_user_id ON memory_messages(user_id, id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_memory_messages_user_mode ON memory_messages(user_id, mode, id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_memory_messages_user_created ON memory_messages(user_id, created_at)")
+
+
+def _support_tables(cur):
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS embedding_cache (
+        model TEXT NOT NULL,
+        text_hash TEXT NOT NULL,
+        vector BLOB NOT NULL,
+        created_at TEXT NOT NULL,
+        PRIMARY KEY(model, text_hash)
+    )
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS backfill_state (
+        job TEXT PRIMARY KEY,
+        last_id INTEGER NOT NULL,
+        updated_at TEXT NOT NULL
+    )
+    """)
+
+
+def _user_mode(cur):
+    _ensure_column(cur, "users", "mode", "TEXT")
+
+
+def _reminder_due_epoch(cur):
+    from db.base import reminder_epoch
+    _ensure_column(cur, "reminders", "due_epoch", "REAL")
+    cur.execute("SELECT id, time FROM reminders WHERE due_epoch IS NULL AND time IS NOT NULL")
+    cur.executemany(
+        "UPDATE reminders SET due_epoch=? WHERE id=?",
+        [(reminder_epoch(time), _id) for _id, time in cur.fetchall()],
+    )
+    # Due/expired sweeps across all users: WHERE status='pending' AND due_epoch <= ?
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_reminders_status_due ON reminders(status, due_epoch)")
+
+
+MIGRATIONS: List[Tuple[int, str, Callable]] = [
+    (1, "base tables", _base_tables),
+    (2, "memory_messages vector columns", _vector_columns),
+    (3, "hot-path indexes", _hot_path_indexes),
+    (4, "embedding cache and backfill state tables", _support_tables),
+    (5, "users.mode", _user_mode),
+    (6, "reminders.due_epoch with backfill and index", _reminder_due_epoch),
+]
+
+
+def _ensure_version_table(conn: sqlite3.Connection):
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        description TEXT NOT NULL,
+        applied_at TEXT NOT NULL
+    )
+    """)
+    conn.commit()
+
+
+def current_version() -> int:
+    conn = get_conn()
+    _ensure_version_table(conn)
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+
+def migrate(target: Optional[int] = None) -> List[int]:
+    """Apply pending migrations up to `target` (default: all); returns the versions applied."""
+    conn = get_conn()
+    applied = []
+    for version, description, step in MIGRATIONS:
+        if target is not None and version > target:
+            break
+        if version <= current_version():
+            continue
+        cur = conn.cursor()
+        try:
+            cur.execute("BEGIN IMMEDIATE")
+            # Another process may have applied it while we waited for the lock.
+            cur.execute("SELECT 1 FROM schema_version WHERE version=?", (version,))
+            if cur.fetchone() is None:
+                step(cur)
+                cur.execute(
+                    "INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)",
+                    (version, description, datetime.utcnow().isoformat()),
+                )
+                applied.append(version)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return applied
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Apply database schema migrations.")
+    parser.add_argument("--list", action="store_true", help="show migrations and whether they are applied")
+    parser.add_argument("--to", type=int, default=None, help="apply migrations up to this version")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        version = current_version()
+        for v, description, _ in MIGRATIONS:
+            print(f"{v:>4}  {'applied' if v <= version else 'pending':8} {description}")
+        return
+
+    applied = migrate(args.to)
+    print(f"Applied {len(applied)} migration(s); schema version {current_version()}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+# db/session.py
+"""
+Backend selection. DB_BACKEND picks the storage behind the memory services:
+"sqlite" (default) or "memory" (db.memory_backend, for tests and benchmarks).
+"""
+import os
+import threading
+from typing import Callable, Dict, Optional
+
+from db.base import Database
+
+DB_BACKEND = os.getenv("DB_BACKEND", "sqlite")
+
+_db: Optional[Database] = None
+_lock = threading.Lock()
+
+
+def _sqlite() -> Database:
+    from db.sqlite_backend import SQLiteDatabase
+    return SQLiteDatabase()
+
+
+def _memory() -> Database:
+    from db.memory_backend import InMemoryDatabase
+    return InMemoryDatabase()
+
+
+BACKENDS: Dict[str, Callable[[], Database]] = {
+    "sqlite": _sqlite,
+    "memory": _memory,
+}
+
+
+def get_db() -> Database:
+    """The configured backend (created on first use)."""
+    global _db
+    if _db is None:
+        with _lock:
+            if _db is None:
+                factory = BACKENDS.get(DB_BACKEND)
+                if factory is None:
+                    raise RuntimeError(f"Unknown DB_BACKEND '{DB_BACKEND}'. Available: {list(BACKENDS)}")
+                _db = factory()
+    return _db
+
+
+def set_db(db: Optional[Database]):
+    """Swap the backend (tests, benchmarks); None goes back to DB_BACKEND."""
+    global _db
+    with _lock:
+        _db = db
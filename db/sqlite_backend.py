@@ -0,0 +1,172 @@
+# db/sqlite_backend.py
+import sqlite3
+from typing import Any, Dict, List, Optional
+
+from db.base import Database, ReminderRow, ScheduledReminder, reminder_epoch
+from db.connection import discard_open_transaction, get_conn
+from db.unit_of_work import run, write
+
+
+class SQLiteDatabase(Database):
+    """The default backend: DB_FILE through db.connection, schema from db.migrations."""
+
+    name = "sqlite"
+
+    def init(self):
+        from db.migrations import migrate
+        migrate()
+
+    # ---- users ----
+    def create_user(self, username: str, hashed_password: str) -> Optional[Dict[str, Any]]:
+        conn = get_conn()
+        cur = conn.cursor()
+        try:
+            cur.execute(
+                "INSERT INTO users (username, password_hash) VALUES (?, ?)",
+                (username, hashed_password)
+            )
+            conn.commit()
+            return {"id": cur.lastrowid, "username": username, "mode": None}
+        except sqlite3.IntegrityError:
+            conn.rollback()
+            return None
+        except Exception:
+            conn.rollback()
+            raise
+
+    def get_user_by_username(self, username: str) -> Optional[Dict[str, Any]]:
+        cur = get_conn().cursor()
+        cur.execute("SELECT id, username, mode FROM users WHERE username=?", (username,))
+        row = cur.fetchone()
+        return {"id": row[0], "username": row[1], "mode": row[2]} if row else None
+
+    def set_user_mode(self, user_id: int, mode: str):
+        write("UPDATE users SET mode=? WHERE id=?", (mode, user_id))
+
+    def get_password_hash(self, username: str) -> Optional[str]:
+        cur = get_conn().cursor()
+        cur.execute("SELECT password_hash FROM users WHERE username=?", (username,))
+        row = cur.fetchone()
+        return row[0] if row else None
+
+    def set_password_hash(self, username: str, hashed_password: str):
+        write("UPDATE users SET password_hash=? WHERE username=?", (hashed_password, username))
+
+    # ---- long-term memory ----
+    _UPSERT_MEMORY = """
+        INSERT INTO memory (user_id, mode, key, value, timestamp)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(user_id, mode, key)
+        DO UPDATE SET value=excluded.value, timestamp=excluded.timestamp
+    """
+
+    def remember(self, user_id: int, mode: str, key: str, value: str, timestamp: str):
+        write(self._UPSERT_MEMORY, (user_id, mode, key, value, timestamp))
+
+    def remember_many(self, user_id: int, mode: str, values: Dict[str, str], timestamp: str):
+        params = [(user_id, mode, key, value, timestamp) for key, value in values.items()]
+        if params:
+            run(lambda cur: cur.executemany(self._UPSERT_MEMORY, params))
+
+    def recall_many(self, user_id: int, mode: str, keys: List[str]) -> Dict[str, str]:
+        if not keys:
+            return {}
+        marks = ",".join("?" * len(keys))
+        cur = get_conn().cursor()
+        cur.execute(
+            f"SELECT key, value FROM memory WHERE user_id=? AND mode=? AND key IN ({marks})",
+            (user_id, mode, *keys),
+        )
+        return dict(cur.fetchall())
+
+    def recall(self, user_id: int, mode: str, key: str) -> Optional[str]:
+        cur = get_conn().cursor()
+        cur.execute("SELECT value FROM memory WHERE user_id=? AND mode=? AND key=?", (user_id, mode, key))
+        row = cur.fetchone()
+        return row[0] if row else None
+
+    def list_memory(self, user_id: int, mode: str) -> List[Dict[str, Any]]:
+        cur = get_conn().cursor()
+        cur.execute("SELECT key, value, timestamp FROM memory WHERE user_id=? AND mode=? ORDER BY timestamp", (user_id, mode))
+        return [{"key": k, "value": v, "timestamp": t} for k, v, t in cur.fetchall()]
+
+    # ---- reminders ----
+    def add_reminder(self, user_id: int, text: str, time: Optional[str], keep: bool, created_at: str):
+        write("""
+            INSERT INTO reminders (user_id, text, time, due_epoch, keep, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (user_id, text, time, reminder_epoch(time), int(keep), created_at))
+
+    def list_reminders(self, user_id: int, include_fired: bool = False) -> List[ReminderRow]:
+        q = """
+            SELECT id, text, time, status, COALESCE(time, created_at) as sort_time
+            FROM reminders
+            WHERE user_id=?
+        """
+        if not include_fired:
+            q += " AND status='pending'"
+        q += " ORDER BY sort_time"
+        cur = get_conn().cursor()
+        cur.execute(q, (user_id,))
+        return cur.fetchall()
+
+    def delete_reminder(self, reminder_id: int):
+        write("DELETE FROM reminders WHERE id=?", (reminder_id,))
+
+    def upcoming_reminders(self, limit: int) -> List[ScheduledReminder]:
+        cur = get_conn().cursor()
+        cur.execute("""
+            SELECT id, user_id, text, due_epoch, keep
+            FROM reminders
+            WHERE status='pending' AND due_epoch IS NOT NULL
+            ORDER BY due_epoch
+            LIMIT ?
+        """, (limit,))
+        return [(r[0], r[1], r[2], r[3], bool(r[4])) for r in cur.fetchall()]
+
+    def take_due_reminders(self, until_epoch: float, fired_at: str) -> List[ScheduledReminder]:
+        # Both statements range-scan idx_reminders_status_due (RETURNING
+        # needs SQLite 3.35+).
+        conn = get_conn()
+        discard_open_transaction(conn)
+        cur = conn.cursor()
+        try:
+            cur.execute("BEGIN IMMEDIATE")
+            cur.execute("""
+                DELETE FROM reminders
+                WHERE status='pending' AND due_epoch <= ? AND keep=0
+                RETURNING id, user_id, text, due_epoch, keep
+            """, (until_epoch,))
+            rows = cur.fetchall()
+            cur.execute("""
+                UPDATE reminders SET status='fired', fired_at=?
+                WHERE status='pending' AND due_epoch <= ? AND keep=1
+                RETURNING id, user_id, text, due_epoch, keep
+            """, (fired_at, until_epoch))
+            rows += cur.fetchall()
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return sorted(((r[0], r[1], r[2], r[3], bool(r[4])) for r in rows), key=lambda r: r[3])
+
+    # ---- message transcript ----
+    def add_message(self, user_id: int, role: str, content: str, created_at: str, mode: Optional[str] = None):
+        write(
+            "INSERT INTO memory_messages (user_id, role, content, created_at, mode) VALUES (?, ?, ?, ?, ?)",
+            (user_id, role, content, created_at, mode),
+        )
+
+    def recent_messages(self, user_id: int, limit: int = 50, mode: Optional[str] = None) -> List[Dict[str, Any]]:
+        q = "SELECT id, role, content, created_at, mode FROM memory_messages WHERE user_id=?"
+        args: tuple = (user_id,)
+        if mode is not None:
+            q += " AND mode=?"
+            args += (mode,)
+        q += " ORDER BY id DESC LIMIT ?"
+        cur = get_conn().cursor()
+        cur.execute(q, args + (limit,))
+        return [
+            {"id": r[0], "role": r[1], "content": r[2], "created_at": r[3], "mode": r[4]}
+            for r in cur.fetchall()
+        ]
@@ -0,0 +1,113 @@
+# db/unit_of_work.py
+"""
+Unit of work: one transaction for everything a request writes.
+
+Inside `with UnitOfWork():` the services' writes (run/write below) are
+collected instead of executed, then applied on exit in a single
+BEGIN IMMEDIATE ... COMMIT: one fsync, and either all of them land or none
+do. An exception inside the block discards them. Nested blocks join the
+outermost one.
+
+Writes are deferred rather than executed early so the write lock is never
+held across slow work in the block (LLM calls). The flip side: reads inside a
+unit of work do not see its own pending writes.
+
+Outside a unit of work, run/write execute and commit immediately.
+"""
+import sqlite3
+import threading
+from typing import Callable, List, Optional, Tuple
+
+from db.connection import discard_open_transaction, get_conn
+
+WriteOp = Callable[[sqlite3.Cursor], None]
+
+_local = threading.local()
+
+
+class UnitOfWork:
+    def __init__(self):
+        self._ops: List[Tuple[WriteOp, Optional[Callable[[], None]]]] = []
+        self._outer: Optional["UnitOfWork"] = None
+
+    def add(self, op: WriteOp, after: Optional[Callable[[], None]] = None):
+        self._ops.append((op, after))
+
+    def commit(self):
+        ops, self._ops = self._ops, []
+        if not ops:
+            return
+        conn = get_conn()
+        discard_open_transaction(conn)
+        cur = conn.cursor()
+        try:
+            cur.execute("BEGIN IMMEDIATE")
+            for op, _ in ops:
+                op(cur)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        for _, after in ops:
+            if after is not None:
+                after()
+
+    def rollback(self):
+        self._ops = []
+
+    def __enter__(self) -> "UnitOfWork":
+        outer = current()
+        if outer is not None:
+            self._outer = outer
+            return outer
+        _local.uow = self
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._outer is not None:
+            return False
+        _local.uow = None
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+        return False
+
+
+def current() -> Optional[UnitOfWork]:
+    """The unit of work active on this thread, if any."""
+    return getattr(_local, "uow", None)
+
+
+def run(op: WriteOp, after: Optional[Callable[[], None]] = None):
+    """
+    Apply op(cursor) in the active unit of work, or now in its own
+    transaction. `after` runs once the write is committed.
+    """
+    uow = current()
+    if uow is not None:
+        uow.add(op, after)
+        return
+    conn = get_conn()
+    discard_open_transaction(conn)
+    try:
+        op(conn.cursor())
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    if after is not None:
+        after()
+
+
+def after_commit(fn: Callable[[], None]):
+    """Run fn once the active unit of work commits, or now if there is none."""
+    uow = current()
+    if uow is None:
+        fn()
+    else:
+        uow.add(lambda cur: None, fn)
+
+
+def write(sql: str, params: tuple = ()):
+    run(lambda cur: cur.execute(sql, params))
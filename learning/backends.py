@@ -0,0 +1,80 @@
+# learning/backends.py
+"""
+Embedding backends.
+
+A backend has a `name` (recorded with every stored vector, so vectors from
+different backends are never compared), a `cacheable` flag telling
+learning.embed_cache whether its results are worth persisting, a `matryoshka`
+flag saying whether its vectors may be truncated to EMBED_DIM, and
+embed(texts) returning one vector per text ([] on failure).
+"""
+import hashlib
+import re
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import List, Tuple
+
+import numpy as np
+
+LOCAL_PREFIX = "local-hash"
+LOCAL_DEFAULT_DIM = 256
+
+_WORD = re.compile(r"\w+")
+
+
+class EmbeddingBackend(ABC):
+    name = ""
+    cacheable = True
+    matryoshka = False
+
+    @abstractmethod
+    def embed(self, texts: List[str]) -> List[list[float]]:
+        raise NotImplementedError
+
+
+@lru_cache(maxsize=1 << 16)
+def _bucket(feature: str, dim: int) -> Tuple[int, float]:
+    h = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+    return h % dim, 1.0 if h >> 63 else -1.0
+
+
+def _features(text: str) -> List[str]:
+    words = _WORD.findall(text.lower())
+    feats = [f"w:{w}" for w in words]
+    feats += [f"b:{a} {b}" for a, b in zip(words, words[1:])]
+    for w in words:
+        padded = f"<{w}>"
+        feats += [f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+    return feats
+
+
+class HashingEmbedder(EmbeddingBackend):
+    """
+    Deterministic local embedder: signed feature hashing of word unigrams,
+    word bigrams and character trigrams into `dim` buckets, with 1 + log(tf)
+    weighting and L2 normalization. No network and no model files; the same
+    text always maps to the same vector.
+    """
+
+    cacheable = False
+
+    def __init__(self, dim: int = LOCAL_DEFAULT_DIM):
+        self.dim = dim
+        self.name = f"{LOCAL_PREFIX}-{dim}"
+
+    def embed(self, texts: List[str]) -> List[list[float]]:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            feats, counts = np.unique(_features(text or ""), return_counts=True)
+            if not feats.size:
+                continue
+            buckets, signs = zip(*(_bucket(f, self.dim) for f in feats))
+            np.add.at(out[i], np.asarray(buckets), np.asarray(signs) * (1.0 + np.log(counts)))
+        norms = np.linalg.norm(out, axis=1)
+        return [(row / n).tolist() if n > 0 else [] for row, n in zip(out, norms)]
+
+
+def parse_local_dim(name: str) -> int:
+    """Dimension encoded in a local backend name ("local-hash-384" -> 384)."""
+    suffix = name[len(LOCAL_PREFIX):].lstrip("-")
+    return int(suffix) if suffix.isdigit() else LOCAL_DEFAULT_DIM
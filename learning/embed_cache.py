@@ -0,0 +1,143 @@
+# learning/embed_cache.py
+"""
+Content-addressed embedding cache keyed by (model, sha256(text)).
+
+Tier 1 is an in-process LRU of float32 vectors. Tier 2 is the embedding_cache
+table in the main SQLite file, so repeated strings (canned replies, common
+phrases) survive restarts. Keys include the model, and rows written under any
+model other than the EMBED_MODEL and EMBED_FALLBACK spaces are dropped by
+init_embedding_cache, so changing EMBED_MODEL never serves vectors from the
+old space.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from db.connection import get_conn
+from memory.embedding_codec import pack_embedding, unpack_embedding
+
+EMBED_CACHE_SIZE = int(os.getenv("EMBED_CACHE_SIZE", "2048"))
+EMBED_CACHE_DB_MAX_ROWS = int(os.getenv("EMBED_CACHE_DB_MAX_ROWS", "100000"))
+
+# How many SQLite inserts between size checks of the table.
+_PRUNE_EVERY = 500
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    def __init__(self, max_entries: int = EMBED_CACHE_SIZE, max_rows: int = EMBED_CACHE_DB_MAX_ROWS):
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self._lru: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._inserts = 0
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        key = (model, text_hash(text))
+        with self._lock:
+            vec = self._lru.get(key)
+            if vec is not None:
+                self._lru.move_to_end(key)
+                self.memory_hits += 1
+                return vec.tolist()
+
+        vec = self._db_get(*key)
+        with self._lock:
+            if vec is None:
+                self.misses += 1
+                return None
+            self.db_hits += 1
+            self._remember(key, vec)
+        return vec.tolist()
+
+    def put(self, model: str, text: str, embedding: List[float]):
+        if not embedding:
+            return
+        key = (model, text_hash(text))
+        vec = np.asarray(embedding, dtype=np.float32)
+        with self._lock:
+            self._remember(key, vec)
+            self._inserts += 1
+            prune = self._inserts % _PRUNE_EVERY == 0
+        self._db_put(key[0], key[1], vec, prune)
+
+    def _remember(self, key: tuple, vec: np.ndarray):
+        self._lru[key] = vec
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    def _db_get(self, model: str, digest: str) -> Optional[np.ndarray]:
+        try:
+            conn = get_conn()
+            cur = conn.cursor()
+            cur.execute("SELECT vector FROM embedding_cache WHERE model=? AND text_hash=?", (model, digest))
+            row = cur.fetchone()
+        except Exception:
+            return None
+        if not row:
+            return None
+        try:
+            return unpack_embedding(row[0])[0]
+        except Exception:
+            return None
+
+    def _db_put(self, model: str, digest: str, vec: np.ndarray, prune: bool = False):
+        conn = get_conn()
+        try:
+            cur = conn.cursor()
+            cur.execute(
+                "INSERT OR REPLACE INTO embedding_cache (model, text_hash, vector, created_at) VALUES (?, ?, ?, ?)",
+                (model, digest, pack_embedding(vec, model), datetime.utcnow().isoformat()),
+            )
+            if prune:
+                # Keep the newest max_rows entries.
+                cur.execute("""
+                    DELETE FROM embedding_cache WHERE rowid IN (
+                        SELECT rowid FROM embedding_cache ORDER BY created_at DESC LIMIT -1 OFFSET ?
+                    )
+                """, (self.max_rows,))
+            conn.commit()
+        except Exception:
+            # The connection is kept open (db.connection): never leave the
+            # transaction, and its write lock, behind.
+            conn.rollback()
+
+    def invalidate(self):
+        with self._lock:
+            self._lru.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.memory_hits + self.db_hits + self.misses
+            return {
+                "entries": len(self._lru),
+                "memory_hits": self.memory_hits,
+                "db_hits": self.db_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.db_hits) / lookups if lookups else 0.0,
+            }
+
+
+embedding_cache = EmbeddingCache()
+
+
+def init_embedding_cache(models: List[str]):
+    """Drop cached rows embedded with any model not in `models` (the table comes from db.migrations)."""
+    conn = get_conn()
+    cur = conn.cursor()
+    placeholders = ",".join("?" for _ in models)
+    cur.execute(f"DELETE FROM embedding_cache WHERE model NOT IN ({placeholders})", tuple(models))
+    conn.commit()
+    embedding_cache.invalidate()
@@ -1,23 +1,280 @@
 # learning/embedder.py
 import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, List, Tuple
+import numpy as np
 import openai
+from learning.backends import LOCAL_PREFIX, EmbeddingBackend, HashingEmbedder, parse_local_dim
+from learning.embed_cache import embedding_cache
 
 openai.api_key = os.getenv("OPENAI_API_KEY")
+
+# EMBED_MODEL picks the backend: an OpenAI model name, or "local-hash[-<dim>]"
+# for the offline hashing embedder. EMBED_FALLBACK (same syntax, empty to
+# disable) is used for texts the primary backend fails on.
 EMBED_MODEL = os.getenv("EMBED_MODEL", "text-embedding-3-small")
+EMBED_FALLBACK = os.getenv("EMBED_FALLBACK", "")
+
+# EMBED_DIM truncates vectors from Matryoshka-trained models (OpenAI's
+# text-embedding-3 family) to their first EMBED_DIM components and
+# renormalizes; 0 keeps the native size. Bump EMBED_VERSION to have
+# workers.backfill re-embed everything after any other change to how vectors
+# are produced.
+EMBED_DIM = int(os.getenv("EMBED_DIM", "0"))
+EMBED_VERSION = int(os.getenv("EMBED_VERSION", "1"))
+
+# Concurrent cache misses are coalesced into one API request: a batch is sent
+# once EMBED_COALESCE_MAX_BATCH inputs are waiting or the oldest has waited
+# EMBED_COALESCE_WINDOW_MS. Set EMBED_COALESCE=0 to call the API directly.
+EMBED_COALESCE = os.getenv("EMBED_COALESCE", "1") == "1"
+EMBED_COALESCE_WINDOW_MS = float(os.getenv("EMBED_COALESCE_WINDOW_MS", "5"))
+EMBED_COALESCE_MAX_BATCH = int(os.getenv("EMBED_COALESCE_MAX_BATCH", "64"))
+EMBED_COALESCE_CONCURRENCY = int(os.getenv("EMBED_COALESCE_CONCURRENCY", "4"))
+# Longest a caller waits for its coalesced batch before giving up with [].
+EMBED_COALESCE_TIMEOUT_SECONDS = float(os.getenv("EMBED_COALESCE_TIMEOUT_SECONDS", "30"))
 
 def embed_text(text: str) -> list[float]:
-    text = (text or "").strip()
-    if not text:
-        return []
+    return embed_texts([text])[0]
+
+def embed_texts(texts: List[str]) -> List[list[float]]:
+    """
+    Embed several strings with at most one request per backend. Results line
+    up with `texts`; blank inputs and failures come back as [].
+    """
+    return [vec for vec, _ in embed_texts_with_model(texts)]
+
+def space_name(b: EmbeddingBackend) -> str:
+    """Identifier of the vector space b produces under the current EMBED_DIM."""
+    return f"{b.name}@{EMBED_DIM}" if EMBED_DIM and b.matryoshka else b.name
+
+def embedding_space() -> str:
+    """The primary backend's vector space; retrieval only compares vectors from it."""
+    return space_name(backend)
+
+def embedding_spaces() -> List[str]:
+    """Every configured vector space: the primary's, then EMBED_FALLBACK's."""
+    spaces = [space_name(backend)]
+    if fallback_backend is not None:
+        spaces.append(space_name(fallback_backend))
+    return spaces
+
+def _fit_dim(b: EmbeddingBackend, vec: list[float]) -> list[float]:
+    if not (EMBED_DIM and b.matryoshka and len(vec) > EMBED_DIM):
+        return vec
+    head = np.asarray(vec[:EMBED_DIM], dtype=np.float32)
+    norm = float(np.linalg.norm(head))
+    return (head / norm).tolist() if norm > 0.0 else []
 
+def embed_texts_with_model(texts: List[str]) -> List[Tuple[list[float], str]]:
+    """
+    Like embed_texts, but each vector comes with the vector space that
+    produced it (see space_name; "" for failures). Texts the primary backend
+    cannot embed are retried on EMBED_FALLBACK, if configured.
+    """
+    out: List[Tuple[list[float], str]] = [([], "") for _ in texts]
+    pending: Dict[str, List[int]] = {}
+    for i, text in enumerate(texts):
+        text = (text or "").strip()
+        if text:
+            pending.setdefault(text, []).append(i)
+
+    for b in (backend, fallback_backend):
+        if b is None or not pending:
+            continue
+        pending = _embed_with(b, pending, out)
+    return out
+
+def _embed_with(b: EmbeddingBackend, pending: Dict[str, List[int]], out: List[Tuple[list[float], str]]) -> Dict[str, List[int]]:
+    """Fill `out` for the texts b can embed; return the ones it could not."""
+    space = space_name(b)
+    missing: Dict[str, List[int]] = {}
+    for text, idxs in pending.items():
+        cached = embedding_cache.get(space, text) if b.cacheable else None
+        if cached is None:
+            missing[text] = idxs
+            continue
+        for i in idxs:
+            out[i] = (cached, space)
+    if not missing:
+        return {}
+
+    unique = list(missing)
+    failed: Dict[str, List[int]] = {}
+    for text, vec in zip(unique, b.embed(unique)):
+        vec = _fit_dim(b, vec) if vec else vec
+        if not vec:
+            failed[text] = missing[text]
+            continue
+        if b.cacheable:
+            embedding_cache.put(space, text, vec)
+        for i in missing[text]:
+            out[i] = (vec, space)
+    return failed
+
+def _embed_remote(texts: List[str], model: str) -> List[list[float]]:
     try:
-        resp = openai.embeddings.create(model=EMBED_MODEL, input=text)
-        return resp.data[0].embedding
+        resp = openai.embeddings.create(model=model, input=texts)
+        return [d.embedding for d in sorted(resp.data, key=lambda d: d.index)]
     except Exception:
         pass
 
     try:
-        resp = openai.Embedding.create(model=EMBED_MODEL, input=text)
-        return resp["data"][0]["embedding"]
+        resp = openai.Embedding.create(model=model, input=texts)
+        return [d["embedding"] for d in sorted(resp["data"], key=lambda d: d["index"])]
     except Exception:
-        return []
+        return [[] for _ in texts]
+
+class _Coalescer:
+    """
+    Collects texts from concurrent callers and embeds them in shared batches.
+    The API rejects a whole request if one input is bad, so when a shared
+    batch comes back with failures, each caller's texts are re-sent on their
+    own and one caller's bad input cannot blank the others'.
+    """
+
+    def __init__(self, fn: Callable[[List[str]], List[list[float]]], window_ms: float, max_batch: int, concurrency: int,
+                 timeout: float = EMBED_COALESCE_TIMEOUT_SECONDS):
+        self.fn = fn
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self.timeout = timeout
+        # (text, future, queued at, caller)
+        self._pending: List[Tuple[str, Future, float, object]] = []
+        self._cond = threading.Condition()
+        self._thread = None
+        # Batches are sent from a small pool so collection continues while
+        # earlier requests are in flight.
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="embed-batch")
+        self.batches = 0
+        self.requests = 0  # queued texts, before de-duplication
+        self.inputs = 0  # distinct texts sent
+        self.max_batch_seen = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.resends = 0
+        self.timeouts = 0
+
+    def embed(self, texts: List[str]) -> List[list[float]]:
+        now = time.monotonic()
+        caller = object()
+        futures = [Future() for _ in texts]
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="embed-coalescer", daemon=True)
+                self._thread.start()
+            self._pending.extend((t, f, now, caller) for t, f in zip(texts, futures))
+            self._cond.notify()
+
+        deadline = now + self.timeout
+        out = []
+        for f in futures:
+            try:
+                out.append(f.result(timeout=max(0.0, deadline - time.monotonic())))
+            except FutureTimeout:
+                out.append([])
+        if any(not f.done() for f in futures):
+            with self._cond:
+                self.timeouts += 1
+        return out
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                deadline = self._pending[0][2] + self.window
+                while len(self._pending) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._pending[:self.max_batch]
+                del self._pending[:self.max_batch]
+            self._executor.submit(self._send, batch)
+
+    def _embed_unique(self, texts: List[str]) -> Dict[str, list[float]]:
+        unique = list(dict.fromkeys(texts))
+        try:
+            return {t: v for t, v in zip(unique, self.fn(unique)) if v}
+        except Exception:
+            return {}
+
+    def _send(self, batch: List[Tuple[str, Future, float, object]]):
+        sent = time.monotonic()
+        unique = list(dict.fromkeys(t for t, _, _, _ in batch))
+        vecs = self._embed_unique(unique)
+
+        resends = 0
+        callers: Dict[object, List[str]] = {}
+        for text, _, _, caller in batch:
+            callers.setdefault(caller, []).append(text)
+        if len(callers) > 1 and len(vecs) < len(unique):
+            for texts in callers.values():
+                if any(t not in vecs for t in texts):
+                    vecs.update(self._embed_unique(texts))
+                    resends += 1
+
+        for text, future, _, _ in batch:
+            future.set_result(vecs.get(text) or [])
+
+        waits = [sent - queued for _, _, queued, _ in batch]
+        with self._cond:
+            self.resends += resends
+            self.batches += 1
+            self.requests += len(batch)
+            self.inputs += len(unique)
+            self.max_batch_seen = max(self.max_batch_seen, len(unique))
+            self.total_wait += sum(waits)
+            self.max_wait = max(self.max_wait, max(waits))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "batches": self.batches,
+                "requests": self.requests,
+                "inputs": self.inputs,
+                "avg_batch_size": self.inputs / self.batches if self.batches else 0.0,
+                "max_batch_size": self.max_batch_seen,
+                "avg_wait_ms": 1000.0 * self.total_wait / self.requests if self.requests else 0.0,
+                "max_wait_ms": 1000.0 * self.max_wait,
+                "resends": self.resends,
+                "timeouts": self.timeouts,
+            }
+
+# One coalescer per OpenAI model, so a batch never mixes models.
+_coalescers: Dict[str, _Coalescer] = {}
+_coalescers_lock = threading.Lock()
+
+def _coalescer(model: str) -> _Coalescer:
+    with _coalescers_lock:
+        c = _coalescers.get(model)
+        if c is None:
+            c = _coalescers[model] = _Coalescer(
+                lambda texts: _embed_remote(texts, model),
+                EMBED_COALESCE_WINDOW_MS, EMBED_COALESCE_MAX_BATCH, EMBED_COALESCE_CONCURRENCY,
+            )
+        return c
+
+def coalescer_stats() -> Dict[str, Dict[str, Any]]:
+    """Batch size and queueing-delay metrics for coalesced embedding requests, by model."""
+    with _coalescers_lock:
+        coalescers = dict(_coalescers)
+    return {model: c.stats() for model, c in coalescers.items()}
+
+class OpenAIBackend(EmbeddingBackend):
+    def __init__(self, model: str):
+        self.name = model
+        self.matryoshka = model.startswith("text-embedding-3")
+
+    def embed(self, texts: List[str]) -> List[list[float]]:
+        return _coalescer(self.name).embed(texts) if EMBED_COALESCE else _embed_remote(texts, self.name)
+
+def get_backend(name: str) -> EmbeddingBackend:
+    if name.startswith(LOCAL_PREFIX):
+        return HashingEmbedder(parse_local_dim(name))
+    return OpenAIBackend(name)
+
+backend = get_backend(EMBED_MODEL)
+fallback_backend = get_backend(EMBED_FALLBACK) if EMBED_FALLBACK else None
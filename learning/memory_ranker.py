@@ -1,35 +1,134 @@
 # learning/memory_ranker.py
-from typing import List, Dict, Any
-import math
-from learning.embedder import embed_text
-from memory.vector_store import fetch_messages_with_embeddings
-
-def _cosine(a: List[float], b: List[float]) -> float:
-    if not a or not b or len(a) != len(b):
-        return 0.0
-    dot = 0.0
-    na = 0.0
-    nb = 0.0
-    for x, y in zip(a, b):
-        dot += x * y
-        na += x * x
-        nb += y * y
-    if na <= 0.0 or nb <= 0.0:
-        return 0.0
-    return dot / (math.sqrt(na) * math.sqrt(nb))
-
-def top_k_relevant_messages(user_id: int, query_text: str, k: int = 8) -> List[Dict[str, Any]]:
-    qvec = embed_text(query_text)
+import os
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+import numpy as np
+from learning.embedder import embed_texts_with_model, embedding_space
+from memory import retrieval, text_index
+from memory.embedding_codec import normalize
+from memory.vector_cache import RowFilter, vector_cache
+from memory.vector_store import fetch_embeddings_by_ids, fetch_messages_with_embeddings, load_user_vectors
+
+SCORE_THRESHOLD = 0.2
+
+# Quantized search keeps k * RESCORE_FACTOR coarse hits (with the cutoff
+# lowered by RESCORE_MARGIN to absorb quantization error) and rescores them
+# against the full-precision vectors.
+RESCORE_FACTOR = int(os.getenv("RESCORE_FACTOR", "4"))
+RESCORE_MARGIN = 0.02
+
+# Hybrid retrieval fuses the HYBRID_POOL best vector hits with the HYBRID_POOL
+# best BM25 hits from memory.text_index by reciprocal-rank fusion
+# (score = sum of 1 / (RRF_K + rank) over the lists a message appears in).
+# Keyword-only hits are vector-scored too and held to the same
+# SCORE_THRESHOLD as vector hits. HYBRID_KEYWORD_BYPASS=1 instead keeps them
+# unless they point away from the query (score <= KEYWORD_SCORE_FLOOR), so
+# exact names and error strings surface even when their similarity is low.
+HYBRID_RETRIEVAL = os.getenv("HYBRID_RETRIEVAL", "1") == "1"
+HYBRID_POOL = int(os.getenv("HYBRID_POOL", "32"))
+HYBRID_KEYWORD_BYPASS = os.getenv("HYBRID_KEYWORD_BYPASS", "0") == "1"
+RRF_K = 60
+KEYWORD_SCORE_FLOOR = 0.0
+
+def top_k_relevant_messages(user_id: int, query_text: str, k: int = 8, mode: Optional[str] = None,
+                            role: Optional[str] = None, since: Optional[datetime] = None,
+                            until: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """
+    The k stored messages most relevant to query_text, optionally restricted
+    to one mode and/or role and to created_at in [since, until) (naive UTC).
+    """
+    if k <= 0:
+        return []
+    qvec, model = embed_texts_with_model([query_text])[0]
     if not qvec:
         return []
+    q = normalize(qvec)
+    filters = RowFilter(mode, role, since, until)
+    if not (HYBRID_RETRIEVAL and text_index.available()):
+        return search_vectors(user_id, q, k, model, filters)
 
-    candidates = fetch_messages_with_embeddings(user_id, limit=500)
-    scored = []
-    for item in candidates:
-        s = _cosine(qvec, item["embedding"])
-        if s > 0.2:
-            scored.append((s, item))
+    pool = max(k, HYBRID_POOL)
+    dense = search_vectors(user_id, q, pool, model, filters)
+    sparse = text_index.keyword_search(user_id, query_text, pool, filters)
+    return _fuse(user_id, q, model, dense, sparse, k)
+
+def _fuse(user_id: int, q: np.ndarray, model: str, dense: List[Dict[str, Any]],
+          sparse: List[Dict[str, Any]], k: int) -> List[Dict[str, Any]]:
+    """Reciprocal-rank fusion of vector hits and BM25 hits, best first."""
+    items = {m["id"]: m for m in dense}
+    fused = {m["id"]: 1.0 / (RRF_K + rank) for rank, m in enumerate(dense, 1)}
 
+    cutoff = KEYWORD_SCORE_FLOOR if HYBRID_KEYWORD_BYPASS else SCORE_THRESHOLD
+    vecs = fetch_embeddings_by_ids(user_id, [m["id"] for m in sparse if m["id"] not in items], model)
+    for rank, m in enumerate(sparse, 1):
+        if m["id"] not in items:
+            vec = vecs.get(m["id"])
+            if vec is None:
+                continue
+            score = float(vec @ q)
+            if score <= cutoff:
+                continue
+            items[m["id"]] = {"score": score, **m, "embedding": vec}
+        fused[m["id"]] = fused.get(m["id"], 0.0) + 1.0 / (RRF_K + rank)
+
+    best = sorted(fused, key=lambda i: (fused[i], items[i]["score"]), reverse=True)[:k]
+    return [{**items[i], "rrf": fused[i]} for i in best]
+
+def search_vectors(user_id: int, q: np.ndarray, k: int, model: Optional[str] = None,
+                   filters: RowFilter = RowFilter()) -> List[Dict[str, Any]]:
+    """
+    Top k stored messages in `model`'s space (default: current) matching
+    `filters` for a unit-normalized query vector.
+    """
+    entry = vector_cache.get(user_id, model or embedding_space(), q.shape[0], load_user_vectors)
+    matrix, rows, mask = entry.snapshot(filters)
+    if not rows or (mask is not None and not mask.any()):
+        return []
+
+    if not entry.quantized:
+        idx, scores = retrieval.search(entry, matrix, q, k, SCORE_THRESHOLD, mask=mask)
+        return [{"score": float(s), **rows[i], "embedding": matrix[i]} for i, s in zip(idx, scores)]
+
+    idx, _ = retrieval.search(entry, matrix, q, k * RESCORE_FACTOR, SCORE_THRESHOLD - RESCORE_MARGIN, mask=mask)
+    full = fetch_embeddings_by_ids(user_id, [rows[i]["id"] for i in idx])
+    scored = []
+    for i in idx:
+        vec = full.get(rows[i]["id"])
+        if vec is None:
+            continue
+        s = float(vec @ q)
+        if s > SCORE_THRESHOLD:
+            scored.append((s, i, vec))
     scored.sort(key=lambda x: x[0], reverse=True)
-    return [{"score": s, **it} for s, it in scored[:k]]
+    return [{"score": s, **rows[i], "embedding": vec} for s, i, vec in scored[:k]]
+
+def measure_recall(user_id: int, k: int = 8, samples: int = 50, seed: int = 0) -> Optional[Dict[str, Any]]:
+    """
+    Recall@k of the configured search path (quantized and/or ANN) against an
+    exact full-precision scan of the user's whole history, using a random
+    sample of the user's own stored vectors as queries.
+    """
+    model = embedding_space()
+    items = fetch_messages_with_embeddings(user_id, limit=-1, model=model)
+    if not items:
+        return None
+    dim = items[0]["embedding"].shape[0]
+    items = [it for it in items if it["embedding"].shape[0] == dim]
+    exact = np.vstack([it["embedding"] for it in items])
+    ids = np.array([it["id"] for it in items])
 
+    rng = np.random.default_rng(seed)
+    recalls = []
+    for qi in rng.choice(len(items), size=min(samples, len(items)), replace=False):
+        q = np.asarray(exact[qi], dtype=np.float32)
+        idx, _ = retrieval.top_k_scores(exact, q, k, SCORE_THRESHOLD)
+        truth = set(ids[idx].tolist())
+        if not truth:
+            continue
+        found = {m["id"] for m in search_vectors(user_id, q, k, model)}
+        recalls.append(len(truth & found) / len(truth))
+    return {
+        "k": k,
+        "queries": len(recalls),
+        "recall_at_k": float(np.mean(recalls)) if recalls else None,
+    }
@@ -2,6 +2,7 @@
 from fastapi import FastAPI
 from api.routes import router as api_router
 from api.profile.routes import router as profile_router
+from api.events.routes import router as events_router
 from workers import logger, reflection
 from threading import Thread
 import time
@@ -22,6 +23,7 @@ def create_app() -> FastAPI:
     # Include routers
     app.include_router(api_router)
     app.include_router(profile_router)
+    app.include_router(events_router)
 
     # ✅ Health/root endpoint (must be defined after `app` exists)
     @app.get("/")
@@ -34,17 +36,10 @@ def create_app() -> FastAPI:
         logger.log_system_event("Background workers starting...")
 
         # -------------------------
-        # Reminder checker loop
+        # Reminder scheduler (sleeps until the next reminder is due)
         # -------------------------
-        def reminder_loop():
-            from workers.reminder import execute_due_reminders, clear_expired_reminders
-            while True:
-                for user_id in range(1, 11):
-                    execute_due_reminders(user_id)
-                    clear_expired_reminders(user_id)
-                time.sleep(30)
-
-        Thread(target=reminder_loop, daemon=True).start()
+        from workers.reminder import reminder_scheduler
+        reminder_scheduler.start()
 
         # -------------------------
         # Daily reflection loop
@@ -57,8 +52,34 @@ def create_app() -> FastAPI:
 
         Thread(target=reflection_loop, daemon=True).start()
 
+        # -------------------------
+        # Re-embed rows from other embedding spaces/versions
+        # -------------------------
+        from workers.backfill import BACKFILL_ENABLED, embedding_backfill
+        if BACKFILL_ENABLED:
+            embedding_backfill.start()
+
         logger.log_system_event("Background workers started.")
 
+    @app.on_event("shutdown")
+    def stop_background_workers():
+        from workers.backfill import embedding_backfill
+        from workers.event_hub import event_hub
+        from workers.reminder import reminder_scheduler
+        from workers.vector_writer import vector_writer
+        reminder_scheduler.stop()
+        event_hub.close_all()
+        embedding_backfill.stop()
+        vector_writer.stop()
+
+        from auth.hashing import shutdown_hashing
+        from db.connection import close_all
+        from db.executor import shutdown_executor
+        shutdown_hashing()
+        shutdown_executor()
+        close_all()
+        logger.log_system_event("Background workers stopped.")
+
     return app
 
 
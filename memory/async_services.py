@@ -0,0 +1,80 @@
+# memory/async_services.py
+"""
+Async counterparts of the memory/long_term services for async routes.
+
+Database calls run on db.executor's bounded pool. Password hashing and
+verification (argon2, deliberately slow) run in auth.hashing's process pool
+instead, so they never occupy a database or request thread; they raise
+auth.hashing.HashingBusy when that pool is saturated.
+"""
+from typing import Any, Dict, List, Optional
+
+from auth.hashing import hash_password_async, verify_password_async
+from db.executor import run_db
+from memory.long_term import MemoryService, ReminderService, UserService
+
+
+class AsyncUserService:
+    @staticmethod
+    async def create_user(username: str, password: str) -> Optional[Dict[str, Any]]:
+        password_hash = await hash_password_async(password)
+        return await run_db(UserService.insert_user, username, password_hash)
+
+    @staticmethod
+    async def verify_user(username: str, password: str) -> bool:
+        password_hash = await run_db(UserService.get_password_hash, username)
+        if not password_hash:
+            return False
+        ok, new_hash = await verify_password_async(password, password_hash)
+        if ok and new_hash:
+            # Stored with outdated argon2 parameters: upgrade it now.
+            await run_db(UserService.set_password_hash, username, new_hash)
+        return ok
+
+    @staticmethod
+    async def get_user(username: str) -> Optional[Dict[str, Any]]:
+        return await run_db(UserService.get_user, username)
+
+    @staticmethod
+    async def get_user_id(username: str) -> Optional[int]:
+        return await run_db(UserService.get_user_id, username)
+
+    @staticmethod
+    async def set_mode(user_id: int, mode: str):
+        await run_db(UserService.set_mode, user_id, mode)
+
+
+class AsyncMemoryService:
+    @staticmethod
+    async def remember(user_id: int, mode: str, key: str, value: str):
+        await run_db(MemoryService.remember, user_id, mode, key, value)
+
+    @staticmethod
+    async def remember_many(user_id: int, mode: str, values: Dict[str, str]):
+        await run_db(MemoryService.remember_many, user_id, mode, values)
+
+    @staticmethod
+    async def recall(user_id: int, mode: str, key: str) -> Optional[str]:
+        return await run_db(MemoryService.recall, user_id, mode, key)
+
+    @staticmethod
+    async def recall_many(user_id: int, mode: str, keys: List[str]) -> Dict[str, str]:
+        return await run_db(MemoryService.recall_many, user_id, mode, keys)
+
+    @staticmethod
+    async def list_memory(user_id: int, mode: str) -> List[Dict[str, Any]]:
+        return await run_db(MemoryService.list_memory, user_id, mode)
+
+
+class AsyncReminderService:
+    @staticmethod
+    async def add_reminder(user_id, text, time=None, keep=False):
+        await run_db(ReminderService.add_reminder, user_id, text, time, keep)
+
+    @staticmethod
+    async def list_reminders(user_id, include_fired=False):
+        return await run_db(ReminderService.list_reminders, user_id, include_fired)
+
+    @staticmethod
+    async def delete_reminder(reminder_id: int):
+        await run_db(ReminderService.delete_reminder, reminder_id)
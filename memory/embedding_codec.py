@@ -0,0 +1,160 @@
+# memory/embedding_codec.py
+"""
+Binary embedding format for memory_messages.embedding.
+
+Layout (little-endian):
+    magic   2s   b"EV"
+    version B    format version
+    dtype   B    payload element type (see DTYPES)
+    dim     I    number of elements
+    mlen    H    length of the model name in bytes
+    model   mlen utf-8 model name
+    pad     0-3  zero bytes so the payload starts 4-byte aligned
+    scale   f    int8 only: per-vector scale (value = code * scale)
+    payload dim * itemsize
+
+float16 and int8 payloads are scalar-quantized copies used for coarse search
+(see QuantizedMatrix); float32 is the full-precision format.
+"""
+import json
+import struct
+from typing import NamedTuple, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+MAGIC = b"EV"
+VERSION = 1
+_HEADER = struct.Struct("<2sBBIH")
+
+DTYPE_F32 = 0
+DTYPE_F16 = 1
+DTYPE_I8 = 2
+DTYPES = {DTYPE_F32: np.dtype("<f4"), DTYPE_F16: np.dtype("<f2"), DTYPE_I8: np.dtype("i1")}
+
+# VECTOR_QUANTIZATION setting -> payload dtype.
+QUANTIZATIONS = {"none": DTYPE_F32, "float16": DTYPE_F16, "int8": DTYPE_I8}
+
+_SCALE = struct.Struct("<f")
+_MATMUL_CHUNK = 4096
+
+
+class EmbeddingHeader(NamedTuple):
+    version: int
+    dtype: int
+    dim: int
+    model: str
+    offset: int
+
+
+def _aligned(n: int) -> int:
+    return (n + 3) & ~3
+
+
+def normalize(vec: Union[Sequence[float], np.ndarray]) -> np.ndarray:
+    """Unit-length float32 copy of vec (zero vectors are returned unchanged)."""
+    arr = np.asarray(vec, dtype=np.float32).ravel()
+    norm = float(np.linalg.norm(arr))
+    return arr / norm if norm > 0.0 else arr
+
+
+def quantize(vec: Union[Sequence[float], np.ndarray], dtype: int = DTYPE_F32) -> Tuple[np.ndarray, float]:
+    """Return (codes, scale) with vec ~= codes * scale."""
+    arr = np.asarray(vec, dtype=np.float32).ravel()
+    if dtype == DTYPE_I8:
+        peak = float(np.abs(arr).max()) if arr.size else 0.0
+        scale = peak / 127.0 if peak > 0.0 else 1.0
+        return np.clip(np.rint(arr / scale), -127, 127).astype(np.int8), scale
+    return arr.astype(DTYPES[dtype]), 1.0
+
+
+def pack_embedding(vec: Union[Sequence[float], np.ndarray], model: str = "", dtype: int = DTYPE_F32) -> bytes:
+    """Serialize a vector as a BLOB with a dim/model header (float32 unless dtype says otherwise)."""
+    codes, scale = quantize(vec, dtype)
+    model_bytes = (model or "").encode("utf-8")
+    head = _HEADER.pack(MAGIC, VERSION, dtype, codes.shape[0], len(model_bytes)) + model_bytes
+    head += b"\x00" * (_aligned(len(head)) - len(head))
+    if dtype == DTYPE_I8:
+        head += _SCALE.pack(scale)
+    return head + codes.tobytes()
+
+
+def read_header(blob: bytes) -> EmbeddingHeader:
+    magic, version, dtype, dim, mlen = _HEADER.unpack_from(blob, 0)
+    if magic != MAGIC:
+        raise ValueError("not an embedding blob")
+    if dtype not in DTYPES:
+        raise ValueError(f"unknown embedding dtype {dtype}")
+    start = _HEADER.size
+    model = bytes(blob[start:start + mlen]).decode("utf-8")
+    return EmbeddingHeader(version, dtype, dim, model, _aligned(start + mlen))
+
+
+def unpack_embedding(blob: Union[bytes, str, None]) -> Tuple[np.ndarray, Optional[str]]:
+    """
+    Return (vector, model) for a stored embedding.
+
+    BLOBs are decoded with numpy.frombuffer, so the vector is a read-only view
+    over the row's bytes rather than a copy. Legacy JSON text is still accepted
+    for rows that have not been migrated yet.
+    """
+    if blob is None:
+        return np.empty(0, dtype="<f4"), None
+    if isinstance(blob, str):
+        return np.asarray(json.loads(blob), dtype="<f4"), None
+    codes, scale, model = unpack_quantized(blob)
+    if codes.dtype == np.float32:
+        return codes, model
+    # Quantized payloads are expanded to float32, which necessarily copies.
+    return codes.astype(np.float32) * np.float32(scale), model
+
+
+def unpack_quantized(blob: bytes) -> Tuple[np.ndarray, float, str]:
+    """(codes, scale, model) as stored: a frombuffer view plus the int8 scale (1.0 otherwise)."""
+    h = read_header(blob)
+    offset, scale = h.offset, 1.0
+    if h.dtype == DTYPE_I8:
+        scale = _SCALE.unpack_from(blob, offset)[0]
+        offset += _SCALE.size
+    return np.frombuffer(blob, dtype=DTYPES[h.dtype], count=h.dim, offset=offset), scale, h.model
+
+
+class QuantizedMatrix:
+    """
+    Row-quantized matrix (float16, or int8 codes with per-row scales) that
+    supports the operations retrieval needs from a float32 matrix: shape,
+    row indexing/slicing and `@`. Products are computed in chunks so the
+    float32 expansion never covers the whole matrix at once.
+    """
+
+    def __init__(self, codes: np.ndarray, scales: Optional[np.ndarray] = None):
+        self.codes = codes
+        self.scales = scales
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        return self.codes.shape
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def __len__(self) -> int:
+        return self.codes.shape[0]
+
+    def __getitem__(self, idx) -> "QuantizedMatrix":
+        return QuantizedMatrix(self.codes[idx], self.scales[idx] if self.scales is not None else None)
+
+    def __matmul__(self, other: np.ndarray) -> np.ndarray:
+        other = np.asarray(other, dtype=np.float32)
+        out = np.empty((self.codes.shape[0],) + other.shape[1:], dtype=np.float32)
+        for i in range(0, self.codes.shape[0], _MATMUL_CHUNK):
+            out[i:i + _MATMUL_CHUNK] = self.codes[i:i + _MATMUL_CHUNK].astype(np.float32) @ other
+        if self.scales is not None:
+            out *= self.scales.reshape((-1,) + (1,) * (out.ndim - 1))
+        return out
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        arr = self.codes.astype(np.float32)
+        if self.scales is not None:
+            arr *= self.scales[:, None]
+        return arr if dtype is None else arr.astype(dtype)
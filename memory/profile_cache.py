@@ -0,0 +1,101 @@
+# memory/profile_cache.py
+"""
+Per-user cache of the profile served by GET /profile/, with its ETag.
+
+Profile fields are stored as MemoryService keys in the "Profile" mode;
+MemoryService drops a user's entry whenever one of PROFILE_FIELDS is written
+(after the write commits), but only in the process that did the write. Other
+worker processes keep serving their entry, and its ETag, until it expires
+after PROFILE_CACHE_TTL_SECONDS; the default is kept short because a client
+revalidating with If-None-Match gets a 304 for that stale entry. With a
+single worker, or a TTL of 0 (no caching), responses are always current.
+
+A reader takes generation() before it reads the profile and passes it to
+put(); the put is dropped if the user was invalidated since, so a slow read
+cannot overwrite the entry of a newer write with the profile it replaced.
+"""
+import hashlib
+import itertools
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+PROFILE_MODE = "Profile"
+PROFILE_FIELDS = ("fullName", "email", "aiPersonality", "preferences", "notificationsEnabled")
+
+PROFILE_CACHE_TTL_SECONDS = float(os.getenv("PROFILE_CACHE_TTL_SECONDS", "5"))
+PROFILE_CACHE_SIZE = int(os.getenv("PROFILE_CACHE_SIZE", "10000"))
+
+
+def profile_etag(profile: Dict[str, Any]) -> str:
+    digest = hashlib.sha256(json.dumps(profile, sort_keys=True).encode("utf-8")).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+class ProfileCache:
+    def __init__(self, max_entries: int = PROFILE_CACHE_SIZE, ttl: float = PROFILE_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[int, Tuple[Dict[str, Any], str, float]]" = OrderedDict()
+        # user_id -> generation of their last invalidation; bounded like the
+        # entries, users dropped from it are treated as invalidated at _floor.
+        self._invalidated: "OrderedDict[int, int]" = OrderedDict()
+        self._floor = 0
+        self._generations = itertools.count(1)
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def generation(self) -> int:
+        """Token to take before reading a profile, for put()."""
+        with self._lock:
+            return self._generation
+
+    def get(self, user_id: int) -> Optional[Tuple[Dict[str, Any], str]]:
+        """(profile, etag) if cached and fresh."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            if entry[2] < time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return entry[0], entry[1]
+
+    def put(self, user_id: int, profile: Dict[str, Any], generation: Optional[int] = None) -> str:
+        """
+        Cache profile and return its etag. With generation (from generation(),
+        taken before the read), nothing is cached if user_id was invalidated since.
+        """
+        etag = profile_etag(profile)
+        if self.ttl <= 0:
+            return etag
+        with self._lock:
+            if generation is not None and self._invalidated.get(user_id, self._floor) > generation:
+                return etag
+            self._entries[user_id] = (profile, etag, time.monotonic() + self.ttl)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return etag
+
+    def invalidate(self, user_id: Optional[int] = None):
+        with self._lock:
+            self._generation = next(self._generations)
+            if user_id is None:
+                self._entries.clear()
+                self._invalidated.clear()
+                self._floor = self._generation
+            else:
+                self._entries.pop(user_id, None)
+                self._invalidated[user_id] = self._generation
+                self._invalidated.move_to_end(user_id)
+                while len(self._invalidated) > self.max_entries:
+                    _, dropped = self._invalidated.popitem(last=False)
+                    self._floor = max(self._floor, dropped)
+
+
+profile_cache = ProfileCache()
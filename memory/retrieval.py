@@ -0,0 +1,169 @@
+# memory/retrieval.py
+"""
+Nearest-neighbour search over a user's cached embedding matrix.
+
+Small histories are scored exactly. Once a user has ANN_MIN_ROWS vectors an IVF
+index (spherical k-means centroids plus inverted lists of row positions) is
+trained in a background thread; queries then score only the rows in the
+ANN_NPROBE closest lists. New rows are assigned to their nearest centroid on
+insert, and the index is retrained once the history has grown by
+ANN_REBUILD_FACTOR since it was last trained.
+
+ANN_NPROBE is the recall/latency knob: more probed lists means more rows scored.
+"""
+import os
+import threading
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+ANN_MIN_ROWS = int(os.getenv("ANN_MIN_ROWS", "5000"))
+ANN_NPROBE = int(os.getenv("ANN_NPROBE", "16"))
+ANN_REBUILD_FACTOR = float(os.getenv("ANN_REBUILD_FACTOR", "2.0"))
+ANN_KMEANS_ITERATIONS = 8
+ANN_TRAIN_POINTS_PER_LIST = 32
+
+_ASSIGN_CHUNK = 4096
+
+
+def top_k_scores(matrix: np.ndarray, qvec: np.ndarray, k: int, threshold: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Row indices and scores of the best k rows of a unit-normalized matrix,
+    best first. One matrix-vector product, a threshold mask and argpartition.
+    """
+    scores = matrix @ qvec
+    idx = np.flatnonzero(scores > threshold)
+    if idx.size > k:
+        idx = idx[np.argpartition(scores[idx], -k)[-k:]]
+    idx = idx[np.argsort(-scores[idx], kind="stable")]
+    return idx, scores[idx]
+
+
+class IVFIndex:
+    def __init__(self, centroids: np.ndarray, trained_size: int):
+        self.centroids = centroids
+        self.trained_size = trained_size
+        self.size = 0
+        self._lists: List[np.ndarray] = [np.empty(0, dtype=np.int64) for _ in range(len(centroids))]
+        self._pending: List[List[int]] = [[] for _ in range(len(centroids))]
+
+    @property
+    def nlist(self) -> int:
+        return self.centroids.shape[0]
+
+    @property
+    def nbytes(self) -> int:
+        return self.centroids.nbytes + 8 * self.size
+
+    @classmethod
+    def train(cls, matrix: np.ndarray, nlist: Optional[int] = None, seed: int = 0) -> "IVFIndex":
+        n = matrix.shape[0]
+        nlist = min(n, nlist or int(np.clip(np.sqrt(n), 16, 1024)))
+        rng = np.random.default_rng(seed)
+        # np.asarray expands a QuantizedMatrix sample to float32.
+        sample = np.asarray(matrix[np.sort(rng.choice(n, size=min(n, nlist * ANN_TRAIN_POINTS_PER_LIST), replace=False))], dtype=np.float32)
+        centroids = sample[rng.choice(sample.shape[0], size=nlist, replace=False)].copy()
+
+        for _ in range(ANN_KMEANS_ITERATIONS):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            norms = np.linalg.norm(sums, axis=1)
+            # Empty lists keep their previous centroid.
+            filled = norms > 0
+            centroids[filled] = sums[filled] / norms[filled, None]
+
+        index = cls(centroids, n)
+        index.add_batch(matrix)
+        return index
+
+    def add_batch(self, vecs: np.ndarray):
+        """Assign vecs to lists as positions size .. size+len(vecs)-1."""
+        start = self.size
+        assign = np.concatenate([
+            np.argmax(vecs[i:i + _ASSIGN_CHUNK] @ self.centroids.T, axis=1)
+            for i in range(0, vecs.shape[0], _ASSIGN_CHUNK)
+        ]) if vecs.shape[0] else np.empty(0, dtype=np.int64)
+        order = np.argsort(assign, kind="stable")
+        bounds = np.searchsorted(assign[order], np.arange(self.nlist + 1))
+        for c in range(self.nlist):
+            lo, hi = bounds[c], bounds[c + 1]
+            if hi > lo:
+                self._lists[c] = np.concatenate([self._lists[c], self._drain(c), start + order[lo:hi]])
+        self.size += vecs.shape[0]
+
+    def add(self, vec: np.ndarray):
+        c = int(np.argmax(self.centroids @ vec))
+        self._pending[c].append(self.size)
+        self.size += 1
+
+    def _drain(self, c: int) -> np.ndarray:
+        pending, self._pending[c] = self._pending[c], []
+        return np.asarray(pending, dtype=np.int64)
+
+    def needs_rebuild(self, n: int) -> bool:
+        return n >= self.trained_size * ANN_REBUILD_FACTOR
+
+    def candidates(self, qvec: np.ndarray, nprobe: int = ANN_NPROBE) -> np.ndarray:
+        """Row positions stored in the nprobe lists closest to qvec."""
+        sims = self.centroids @ qvec
+        if nprobe < self.nlist:
+            probes = np.argpartition(-sims, nprobe - 1)[:nprobe]
+        else:
+            probes = np.arange(self.nlist)
+        parts = []
+        for c in probes:
+            parts.append(self._lists[c])
+            if self._pending[c]:
+                parts.append(np.asarray(self._pending[c], dtype=np.int64))
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+
+
+def _build_index(entry, matrix: np.ndarray, generation: int):
+    try:
+        index = IVFIndex.train(matrix)
+    except Exception:
+        index = None
+    entry.attach_index(index, generation)
+
+
+def _schedule_build(entry, matrix: np.ndarray):
+    generation = entry.claim_index_build()
+    if generation is not None:
+        threading.Thread(target=_build_index, args=(entry, matrix, generation), daemon=True).start()
+
+
+def _exact(matrix: np.ndarray, qvec: np.ndarray, k: int, threshold: float,
+           mask: Optional[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    if mask is None:
+        return top_k_scores(matrix, qvec, k, threshold)
+    rows = np.flatnonzero(mask)
+    idx, scores = top_k_scores(matrix[rows], qvec, k, threshold)
+    return rows[idx], scores
+
+
+def search(entry, matrix: np.ndarray, qvec: np.ndarray, k: int, threshold: float,
+           nprobe: int = ANN_NPROBE, mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Top k rows of `matrix` (a view of `entry`, a memory.vector_cache.UserVectors)
+    for qvec, among the rows where `mask` is set (all rows when it is None).
+    Exact below ANN_MIN_ROWS, while the first index is training, or when the
+    entry keeps a fixed window (already bounded, and its view does not start
+    at position 0). Masked-out rows are dropped before scoring.
+    """
+    n = matrix.shape[0]
+    if n < ANN_MIN_ROWS or entry.window:
+        return _exact(matrix, qvec, k, threshold, mask)
+
+    index = entry.index
+    if index is None or index.needs_rebuild(n):
+        _schedule_build(entry, matrix)
+    if index is None:
+        return _exact(matrix, qvec, k, threshold, mask)
+
+    cand = index.candidates(qvec, nprobe)
+    cand = cand[cand < n]
+    if mask is not None:
+        cand = cand[mask[cand]]
+    idx, scores = top_k_scores(matrix[cand], qvec, k, threshold)
+    return cand[idx], scores
@@ -0,0 +1,145 @@
+# memory/text_index.py
+"""
+Full-text index over memory_messages.content.
+
+memory_messages_fts is an external-content FTS5 table kept in step with
+memory_messages by triggers, so every insert path (add_messages, the vector
+writer, imports) is indexed without extra work. keyword_search ranks a user's
+whole history by BM25; memory_ranker fuses that list with the vector results.
+
+The index is shared by all users and the user filter is applied after the
+MATCH, so a query costs in proportion to the postings of its terms across the
+whole corpus. Queries therefore keep only informative terms: stopwords are
+dropped, as are terms found in too many messages (document counts from the
+fts5vocab table), and at most MAX_QUERY_TERMS of the rarest remain.
+
+SQLite builds without FTS5 leave the index unavailable and retrieval stays
+vector-only.
+"""
+import os
+import re
+import sqlite3
+from typing import Any, Dict, List, Optional
+
+from db.connection import get_conn
+from memory.vector_cache import RowFilter
+from memory.vector_store import row_filter_sql
+
+# Longest query (in terms) sent to MATCH: the rarest terms are kept; the rest
+# of a long message adds little to the ranking and makes the query slower.
+MAX_QUERY_TERMS = int(os.getenv("KEYWORD_MAX_QUERY_TERMS", "8"))
+# A term is too common to search for once it occurs in more than
+# max(KEYWORD_COMMON_MIN_DOCS, KEYWORD_COMMON_FRACTION * messages) messages.
+KEYWORD_COMMON_MIN_DOCS = int(os.getenv("KEYWORD_COMMON_MIN_DOCS", "1000"))
+KEYWORD_COMMON_FRACTION = float(os.getenv("KEYWORD_COMMON_FRACTION", "0.01"))
+
+STOPWORDS = frozenset("""
+a about after again all also am an and any are as at be because been before being
+but by can could did do does doing don for from get got had has have having he her
+here hers him his how i if in into is it its just me more most my no not now of on
+once only or other our ours out over own same she should so some such than that the
+their theirs them then there these they this those through to too under until up
+very was we were what when where which while who whom why will with would you your
+yours
+""".split())
+
+_TERM = re.compile(r"\w+")
+
+_available = False
+
+
+def init_text_index():
+    """Create the FTS table and its triggers; index existing rows on first run."""
+    global _available
+    conn = get_conn()
+    cur = conn.cursor()
+    cur.execute("SELECT 1 FROM sqlite_master WHERE name='memory_messages_fts'")
+    exists = cur.fetchone() is not None
+    try:
+        cur.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS memory_messages_fts
+        USING fts5(content, content='memory_messages', content_rowid='id')
+        """)
+    except sqlite3.OperationalError:
+        _available = False
+        return
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS memory_messages_fts_ai AFTER INSERT ON memory_messages BEGIN
+        INSERT INTO memory_messages_fts(rowid, content) VALUES (new.id, new.content);
+    END
+    """)
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS memory_messages_fts_ad AFTER DELETE ON memory_messages BEGIN
+        INSERT INTO memory_messages_fts(memory_messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+    END
+    """)
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS memory_messages_fts_au AFTER UPDATE OF content ON memory_messages BEGIN
+        INSERT INTO memory_messages_fts(memory_messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+        INSERT INTO memory_messages_fts(rowid, content) VALUES (new.id, new.content);
+    END
+    """)
+    # Per-term document counts, for dropping common terms from queries.
+    cur.execute("""
+    CREATE VIRTUAL TABLE IF NOT EXISTS memory_messages_fts_vocab
+    USING fts5vocab(memory_messages_fts, 'row')
+    """)
+    if not exists:
+        cur.execute("INSERT INTO memory_messages_fts(memory_messages_fts) VALUES ('rebuild')")
+    conn.commit()
+    _available = True
+
+
+def available() -> bool:
+    return _available
+
+
+def query_terms(text: str) -> List[str]:
+    """Distinct lower-cased terms of free text, stopwords removed, in order."""
+    return [t for t in dict.fromkeys(t.lower() for t in _TERM.findall(text or "")) if t not in STOPWORDS]
+
+
+def match_query(terms: List[str]) -> str:
+    """FTS5 MATCH expression for terms: quoted, OR-ed."""
+    return " OR ".join(f'"{t}"' for t in terms)
+
+
+def _rare_terms(cur, terms: List[str]) -> List[str]:
+    """The MAX_QUERY_TERMS rarest indexed terms, skipping ones too common to be worth matching."""
+    if not terms:
+        return []
+    marks = ",".join("?" * len(terms))
+    cur.execute(f"SELECT term, doc FROM memory_messages_fts_vocab WHERE term IN ({marks})", terms)
+    docs = dict(cur.fetchall())
+    cur.execute("SELECT MAX(id) FROM memory_messages")
+    total = cur.fetchone()[0] or 0
+    limit = max(KEYWORD_COMMON_MIN_DOCS, KEYWORD_COMMON_FRACTION * total)
+    # Terms absent from the index cannot match anything.
+    kept = [t for t in terms if 0 < docs.get(t, 0) <= limit]
+    return sorted(kept, key=docs.get)[:MAX_QUERY_TERMS]
+
+
+def keyword_search(user_id: int, text: str, limit: int, filters: Optional[RowFilter] = None) -> List[Dict[str, Any]]:
+    """The user's best `limit` messages matching `filters` for `text` by BM25, best first."""
+    terms = query_terms(text)
+    if not _available or not terms or limit <= 0:
+        return []
+    filter_sql, filter_args = row_filter_sql(filters, "m")
+    conn = get_conn()
+    cur = conn.cursor()
+    try:
+        query = match_query(_rare_terms(cur, terms))
+        if not query:
+            return []
+        cur.execute(f"""
+            SELECT m.id, m.role, m.content, m.created_at, m.mode
+            FROM memory_messages_fts
+            JOIN memory_messages m ON m.id = memory_messages_fts.rowid
+            WHERE memory_messages_fts MATCH ? AND m.user_id=?{filter_sql}
+            ORDER BY memory_messages_fts.rank
+            LIMIT ?
+        """, (query, user_id, *filter_args, limit))
+        rows = cur.fetchall()
+    except sqlite3.OperationalError:
+        rows = []
+    return [{"id": r[0], "role": r[1], "content": r[2], "created_at": r[3], "mode": r[4]} for r in rows]
@@ -0,0 +1,402 @@
+# memory/vector_cache.py
+"""
+Process-level cache of each active user's normalized embedding matrix.
+
+add_message is the only writer and runs in this process, so entries are kept
+current by appending in place instead of re-reading SQLite on every retrieval.
+Idle users are evicted least-recently-used first once the total footprint
+exceeds VECTOR_CACHE_MAX_BYTES.
+
+Users stored in memory-mapped shard files (VECTOR_STORAGE=shards) get a
+MappedUserVectors entry instead: its matrix is a view over the page cache, so
+only row metadata counts against the budget.
+
+Entries are keyed by (user_id, embedding space), so a query only ever meets
+vectors from the space it was embedded in.
+
+VECTOR_HISTORY_WINDOW caps how many of a user's newest rows are kept; 0 (the
+default) keeps the whole history and leaves it to memory.retrieval's index to
+keep searches bounded.
+"""
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from memory.embedding_codec import DTYPE_F32, DTYPE_I8, DTYPES, QuantizedMatrix, quantize
+
+VECTOR_CACHE_MAX_BYTES = int(os.getenv("VECTOR_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+HISTORY_WINDOW = int(os.getenv("VECTOR_HISTORY_WINDOW", "0"))
+
+# Rough per-row cost of the metadata dict on top of the content string.
+_ROW_OVERHEAD_BYTES = 256
+
+
+def _epoch(created_at: Optional[str]) -> float:
+    try:
+        return datetime.fromisoformat(created_at).timestamp()
+    except (TypeError, ValueError):
+        return float("nan")
+
+
+class RowLabels:
+    """
+    Columnar copy of the filterable row metadata (mode, role, created_at), so
+    filtered searches build their mask with a few vectorized comparisons
+    instead of walking the row dicts. Modes and roles are stored as codes
+    into a vocabulary shared by all entries.
+    """
+
+    _vocab: Dict[Optional[str], int] = {}
+    _vocab_lock = threading.Lock()
+
+    def __init__(self, capacity: int = 64):
+        self.modes = np.empty(capacity, dtype=np.int32)
+        self.roles = np.empty(capacity, dtype=np.int32)
+        self.times = np.empty(capacity, dtype=np.float64)
+        self.size = 0
+
+    @property
+    def nbytes(self) -> int:
+        return self.modes.nbytes + self.roles.nbytes + self.times.nbytes
+
+    @classmethod
+    def code(cls, label: Optional[str]) -> int:
+        with cls._vocab_lock:
+            return cls._vocab.setdefault(label, len(cls._vocab))
+
+    def append(self, row: Dict[str, Any]):
+        if self.size == self.modes.shape[0]:
+            self._resize(max(64, 2 * self.size))
+        self.modes[self.size] = self.code(row.get("mode"))
+        self.roles[self.size] = self.code(row.get("role"))
+        self.times[self.size] = _epoch(row.get("created_at"))
+        self.size += 1
+
+    def drop_oldest(self, count: int):
+        keep = self.size - count
+        for col in (self.modes, self.roles, self.times):
+            col[:keep] = col[count:self.size]
+        self.size = keep
+
+    def _resize(self, capacity: int):
+        for name in ("modes", "roles", "times"):
+            col = getattr(self, name)
+            grown = np.empty(capacity, dtype=col.dtype)
+            grown[:self.size] = col[:self.size]
+            setattr(self, name, grown)
+
+    def mask(self, start: int, stop: int, filters: "RowFilter") -> np.ndarray:
+        keep = np.ones(stop - start, dtype=bool)
+        if filters.mode is not None:
+            modes = self.modes[start:stop]
+            keep &= (modes == self.code(filters.mode)) | (modes == self.code(None))
+        if filters.role is not None:
+            keep &= self.roles[start:stop] == self.code(filters.role)
+        if filters.since is not None:
+            keep &= self.times[start:stop] >= filters.since.timestamp()
+        if filters.until is not None:
+            keep &= self.times[start:stop] < filters.until.timestamp()
+        return keep
+
+
+class RowFilter(NamedTuple):
+    """
+    Retrieval filters: exact mode and role, and a [since, until) window on
+    created_at (naive UTC datetimes, like the stored timestamps). None
+    means unfiltered. Rows stored before modes were recorded (mode NULL)
+    match any mode, so pre-existing history stays retrievable.
+    """
+    mode: Optional[str] = None
+    role: Optional[str] = None
+    since: Optional[datetime] = None
+    until: Optional[datetime] = None
+
+    @property
+    def active(self) -> bool:
+        return any(v is not None for v in self)
+
+
+
+class UserVectors:
+    """
+    Normalized embedding matrix and row metadata for one user, oldest first.
+    With a quantized dtype (embedding_codec.DTYPE_F16/DTYPE_I8) the matrix
+    holds codes and view() returns a QuantizedMatrix.
+    """
+
+    def __init__(self, dim: int, window: int = HISTORY_WINDOW, capacity: int = 64, dtype: int = DTYPE_F32):
+        self.dim = dim
+        self.window = window
+        self.dtype = dtype
+        self.matrix = np.empty((capacity, dim), dtype=DTYPES[dtype])
+        self.scales = np.empty(capacity, dtype=np.float32) if dtype == DTYPE_I8 else None
+        self.rows: List[Dict[str, Any]] = []
+        self.labels = RowLabels(capacity or 64)
+        self.size = 0
+        self._meta_bytes = 0
+        self.lock = threading.Lock()
+        # ANN index over row positions (see memory.retrieval). `generation`
+        # changes whenever positions shift, so stale builds are discarded.
+        self.index = None
+        self.generation = 0
+        self._index_building = False
+
+    @property
+    def quantized(self) -> bool:
+        return self.dtype != DTYPE_F32
+
+    @property
+    def nbytes(self) -> int:
+        scales = self.scales.nbytes if self.scales is not None else 0
+        return (self.matrix.nbytes + scales + self.labels.nbytes + self._meta_bytes
+                + (self.index.nbytes if self.index is not None else 0))
+
+    def append(self, row: Dict[str, Any], vec: np.ndarray):
+        """Append a full-precision normalized vector (quantized here if needed)."""
+        codes, scale = quantize(vec, self.dtype) if self.quantized else (vec, 1.0)
+        self.append_encoded(row, codes, scale, vec)
+
+    def append_encoded(self, row: Dict[str, Any], codes: np.ndarray, scale: float = 1.0, vec: Optional[np.ndarray] = None):
+        """Append a row already in this entry's dtype (e.g. decoded from embedding_q)."""
+        with self.lock:
+            if self.size == self.matrix.shape[0]:
+                self._grow()
+            # Writes land past `size`, so views handed out earlier never change.
+            self.matrix[self.size] = codes
+            if self.scales is not None:
+                self.scales[self.size] = scale
+            self.rows.append(row)
+            self.labels.append(row)
+            self.size += 1
+            self._meta_bytes += _ROW_OVERHEAD_BYTES + len(row.get("content") or "")
+            if self.index is not None:
+                self.index.add(vec if vec is not None else codes.astype(np.float32) * np.float32(scale))
+
+    def _grow(self):
+        keep = self.size
+        if self.window and self.size >= 2 * self.window:
+            keep = self.window
+        capacity = max(64, 2 * keep)
+        matrix = np.empty((capacity, self.dim), dtype=self.matrix.dtype)
+        matrix[:keep] = self.matrix[self.size - keep:self.size]
+        if self.scales is not None:
+            scales = np.empty(capacity, dtype=np.float32)
+            scales[:keep] = self.scales[self.size - keep:self.size]
+            self.scales = scales
+        dropped = self.rows[:self.size - keep]
+        self.labels.drop_oldest(len(dropped))
+        self.matrix = matrix
+        self.rows = self.rows[self.size - keep:]
+        self.size = keep
+        self._meta_bytes -= sum(_ROW_OVERHEAD_BYTES + len(r.get("content") or "") for r in dropped)
+        if dropped:
+            self.index = None
+            self.generation += 1
+
+    def _current_matrix(self):
+        if self.quantized:
+            return QuantizedMatrix(self.matrix, self.scales)
+        return self.matrix
+
+    def view(self) -> Tuple[np.ndarray, List[Dict[str, Any]]]:
+        """The newest `window` rows as (matrix view, metadata list)."""
+        matrix, rows, _ = self.snapshot()
+        return matrix, rows
+
+    def snapshot(self, filters: RowFilter = RowFilter()) -> Tuple[np.ndarray, List[Dict[str, Any]], Optional[np.ndarray]]:
+        """
+        view() plus the boolean mask of its rows matching filters (None when
+        unfiltered), taken together so a concurrent append cannot make the
+        mask longer than the matrix.
+        """
+        with self.lock:
+            matrix = self._current_matrix()
+            start = max(0, self.size - self.window) if self.window else 0
+            mask = self.labels.mask(start, self.size, filters) if filters.active else None
+            return matrix[start:self.size], self.rows[start:self.size], mask
+
+    def accepts(self, shard_row: Optional[int]) -> bool:
+        """Whether a new row can be appended in place."""
+        return True
+
+    def claim_index_build(self) -> Optional[int]:
+        """Mark an index build as started; None if one is already running."""
+        with self.lock:
+            if self._index_building:
+                return None
+            self._index_building = True
+            return self.generation
+
+    def attach_index(self, index, generation: int):
+        """Install a freshly trained index, catching up rows appended meanwhile."""
+        with self.lock:
+            self._index_building = False
+            if index is None or generation != self.generation:
+                return
+            if index.size < self.size:
+                index.add_batch(self._current_matrix()[index.size:self.size])
+            self.index = index
+
+
+class MappedUserVectors(UserVectors):
+    """
+    Entry backed by a read-only numpy.memmap over a user's shard file, where
+    matrix row i is shard row i. Appends only record metadata; the file is
+    remapped lazily on the next view.
+    """
+
+    def __init__(self, dim: int, path: str):
+        super().__init__(dim, window=0, capacity=0)
+        self.path = path
+        self._stale = True
+
+    @property
+    def nbytes(self) -> int:
+        return self.labels.nbytes + self._meta_bytes + (self.index.nbytes if self.index is not None else 0)
+
+    def add_row(self, row: Dict[str, Any]):
+        self.rows.append(row)
+        self.labels.append(row)
+        self.size += 1
+        self._meta_bytes += _ROW_OVERHEAD_BYTES + len(row.get("content") or "")
+        self._stale = True
+
+    def accepts(self, shard_row: Optional[int]) -> bool:
+        return shard_row == self.size
+
+    def append(self, row: Dict[str, Any], vec: np.ndarray):
+        with self.lock:
+            self.add_row(row)
+            if self.index is not None:
+                self.index.add(vec)
+
+    def _current_matrix(self) -> np.ndarray:
+        # Shard rows are written before the row is cached, so a fresh map
+        # always covers `size` rows.
+        if self._stale or self.matrix.shape[0] < self.size:
+            from memory.vector_store import open_shard_file
+            self.matrix = open_shard_file(self.path, self.dim)
+            self._stale = False
+        return self.matrix
+
+
+class _Load:
+    """A load of one key in progress. `stale` is set if the key was written meanwhile."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.stale = False
+
+
+class VectorCache:
+    def __init__(self, max_bytes: int = VECTOR_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple[int, str], UserVectors]" = OrderedDict()
+        self._loading: Dict[Tuple[int, str], _Load] = {}
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, user_id: int, model: str, dim: int,
+            loader: Callable[[int, str, int], UserVectors]) -> UserVectors:
+        """
+        Cached entry for (user_id, model), loading it with loader(user_id,
+        model, dim) on a miss. The load runs outside the cache lock, so other
+        users' hits and appends never wait for it; concurrent misses on the
+        same key wait for the one load. A load that overlapped an append or
+        invalidate of its key is returned but not cached (it may miss the
+        new row), and the next call loads again.
+        """
+        key = (user_id, model)
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry.dim == dim:
+                    self.hits += 1
+                    self._entries.move_to_end(key)
+                    return entry
+                load = self._loading.get(key)
+                if load is None:
+                    self.misses += 1
+                    load = self._loading[key] = _Load()
+                    break
+            load.done.wait()
+
+        try:
+            entry = loader(user_id, model, dim)
+        except BaseException:
+            with self._lock:
+                del self._loading[key]
+            load.done.set()
+            raise
+        with self._lock:
+            del self._loading[key]
+            if not load.stale:
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+                self._evict()
+        load.done.set()
+        return entry
+
+    def append(self, user_id: int, model: str, row: Dict[str, Any], vec: np.ndarray,
+               shard_row: Optional[int] = None):
+        """Add a freshly stored row to a cached user; uncached users are left alone."""
+        key = (user_id, model)
+        with self._lock:
+            if key in self._loading:
+                self._loading[key].stale = True
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            if entry.dim != vec.shape[0] or not entry.accepts(shard_row):
+                del self._entries[key]
+                return
+            entry.append(row, vec)
+            self._evict()
+
+    def invalidate(self, user_id: Optional[int] = None):
+        """Drop every cached space of user_id, or everything."""
+        with self._lock:
+            for key, load in self._loading.items():
+                if user_id is None or key[0] == user_id:
+                    load.stale = True
+            if user_id is None:
+                self._entries.clear()
+            else:
+                for key in [key for key in self._entries if key[0] == user_id]:
+                    del self._entries[key]
+
+    @property
+    def nbytes(self) -> int:
+        with self._lock:
+            return sum(e.nbytes for e in self._entries.values())
+
+    def _evict(self):
+        total = sum(e.nbytes for e in self._entries.values())
+        # Never evict the most recently used entry, even if it alone is over budget.
+        while total > self.max_bytes and len(self._entries) > 1:
+            _, entry = self._entries.popitem(last=False)
+            total -= entry.nbytes
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "users": len({user_id for user_id, _ in self._entries}),
+                "entries": len(self._entries),
+                "bytes": sum(e.nbytes for e in self._entries.values()),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+vector_cache = VectorCache()
@@ -1,60 +1,446 @@
 # memory/vector_store.py
-import sqlite3
+import os
 import json
+import threading
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+from db.connection import get_conn
+from db.unit_of_work import run
+from memory.embedding_codec import QUANTIZATIONS, normalize, pack_embedding, read_header, unpack_embedding, unpack_quantized
+from memory.vector_cache import HISTORY_WINDOW, MappedUserVectors, RowFilter, UserVectors, vector_cache
 
-DB_FILE = "ai_memory.db"
+# "sqlite" keeps vectors as BLOBs in memory_messages. "shards" appends them to
+# per-user <user_id>_<dim>.f32 files under VECTOR_SHARD_DIR that are read back
+# with numpy.memmap; SQLite then only holds the row's content and shard_row.
+# A vector's row number is its position in the file, so appends hold an
+# exclusive flock on the file around the size check and the write; several
+# worker processes on one host can share the directory. Without fcntl
+# (Windows) only the in-process lock applies and shard storage is safe for a
+# single process only. A network filesystem without working flock is unsafe
+# for the same reason. The shard is written before the row's transaction
+# commits, so a rollback leaves an unreferenced row in the file; the loader
+# then sees row numbers with gaps and falls back to a copy (see
+# _load_mapped_vectors).
+VECTOR_STORAGE = os.getenv("VECTOR_STORAGE", "sqlite")
+VECTOR_SHARD_DIR = os.getenv("VECTOR_SHARD_DIR", "vector_shards")
 
-def get_conn():
-    return sqlite3.connect(DB_FILE, check_same_thread=False)
+# "float16" or "int8" additionally stores a scalar-quantized copy of each
+# vector in embedding_q. Cached matrices and the coarse scan then use the
+# quantized copy, and only a shortlist is rescored at full precision.
+VECTOR_QUANTIZATION = os.getenv("VECTOR_QUANTIZATION", "none")
+QUANT_DTYPE = QUANTIZATIONS.get(VECTOR_QUANTIZATION, QUANTIZATIONS["none"])
+QUANTIZED = VECTOR_QUANTIZATION in QUANTIZATIONS and VECTOR_QUANTIZATION != "none"
+
+_shard_lock = threading.Lock()
+
+# Every stored vector records the embedding space it belongs to
+# (embedding_model, see learning.embedder.space_name) and EMBED_VERSION.
+# Retrieval only loads rows from the current space and version, so vectors
+# from different models or dimensions are never compared; workers.backfill
+# re-embeds the rest.
+LEGACY_EMBED_VERSION = 1
+
+def _default_model() -> str:
+    from learning.embedder import embedding_space
+    return embedding_space()
+
+def _current_version() -> int:
+    from learning.embedder import EMBED_VERSION
+    return EMBED_VERSION
 
 def init_vector_tables():
+    """
+    Bring stored vectors up to the current format (the table itself is created
+    by db.migrations) and set up the full-text index.
+    """
+    migrate_json_embeddings()
+    label_legacy_embeddings()
+    if QUANTIZED:
+        quantize_existing_embeddings()
+    from memory.text_index import init_text_index
+    init_text_index()
+
+def shard_path(user_id: int, dim: int) -> str:
+    return os.path.join(VECTOR_SHARD_DIR, f"{user_id}_{dim}.f32")
+
+def _append_to_shard(user_id: int, vec: np.ndarray) -> int:
+    """Append a vector to the user's shard file and return its row number."""
+    data = np.asarray(vec, dtype="<f4").tobytes()
+    with _shard_lock:
+        os.makedirs(VECTOR_SHARD_DIR, exist_ok=True)
+        with open(shard_path(user_id, vec.shape[0]), "ab") as f:
+            if fcntl is not None:
+                # Other processes append to the same file.
+                fcntl.flock(f, fcntl.LOCK_EX)
+            f.seek(0, os.SEEK_END)
+            row = f.tell() // len(data)
+            f.write(data)
+            # Flushed before the lock is released (on close).
+            f.flush()
+    return row
+
+def open_shard(user_id: int, dim: int) -> np.ndarray:
+    return open_shard_file(shard_path(user_id, dim), dim)
+
+def open_shard_file(path: str, dim: int) -> np.ndarray:
+    """Read-only memmap of a shard as a (rows, dim) matrix; empty if missing."""
+    if not os.path.exists(path) or os.path.getsize(path) < 4 * dim:
+        return np.empty((0, dim), dtype=np.float32)
+    mm = np.memmap(path, dtype="<f4", mode="r")
+    return mm[:mm.shape[0] - mm.shape[0] % dim].reshape(-1, dim)
+
+def migrate_json_embeddings(batch_size: int = 500) -> int:
+    """
+    One-shot conversion of legacy JSON TEXT embeddings to packed, unit-normalized
+    float32 BLOBs. Safe to call repeatedly; returns the number of rows converted.
+    """
+    model = _default_model()
+    conn = get_conn()
+    cur = conn.cursor()
+    converted = 0
+    while True:
+        cur.execute(
+            "SELECT id, embedding FROM memory_messages WHERE typeof(embedding)='text' LIMIT ?",
+            (batch_size,),
+        )
+        rows = cur.fetchall()
+        if not rows:
+            break
+        updates = []
+        for _id, emb in rows:
+            try:
+                vec = json.loads(emb)
+            except Exception:
+                vec = None
+            updates.append((pack_embedding(normalize(vec), model) if vec else None, _id))
+        cur.executemany("UPDATE memory_messages SET embedding=? WHERE id=?", updates)
+        conn.commit()
+        converted += len(updates)
+    return converted
+
+def _header_field(blob, field: str):
+    try:
+        return getattr(read_header(blob), field)
+    except Exception:
+        return None
+
+def label_legacy_embeddings() -> int:
+    """
+    Record embedding_model/embedding_dim for BLOB rows written before they
+    were tracked, using the model and dim in each BLOB's header. Rows whose
+    space cannot be determined (legacy shard rows) stay unlabelled and are
+    re-embedded by workers.backfill.
+    """
     conn = get_conn()
+    conn.create_function("embedding_header_model", 1, lambda b: _header_field(b, "model") or None)
+    conn.create_function("embedding_header_dim", 1, lambda b: _header_field(b, "dim"))
     cur = conn.cursor()
     cur.execute("""
-    CREATE TABLE IF NOT EXISTS memory_messages (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id INTEGER NOT NULL,
-        role TEXT NOT NULL,
-        content TEXT NOT NULL,
-        created_at TEXT NOT NULL,
-        embedding TEXT,
-        FOREIGN KEY(user_id) REFERENCES users(id)
-    )
-    """)
+        UPDATE memory_messages
+        SET embedding_model = embedding_header_model(embedding),
+            embedding_dim = COALESCE(embedding_dim, embedding_header_dim(embedding)),
+            embedding_version = ?
+        WHERE embedding_model IS NULL AND embedding IS NOT NULL
+    """, (LEGACY_EMBED_VERSION,))
+    labelled = cur.rowcount
     conn.commit()
-    conn.close()
+    return labelled
 
-def add_message(user_id: int, role: str, content: str, embedding: Optional[List[float]] = None):
+def quantize_existing_embeddings(batch_size: int = 500) -> int:
+    """
+    Fill embedding_q for rows stored before quantization was enabled, and
+    re-encode rows quantized with another VECTOR_QUANTIZATION dtype (the
+    dtype is the 4th byte of the blob header, see embedding_codec).
+    """
+    model = _default_model()
+    stored_dtype = "%02X" % QUANT_DTYPE
     conn = get_conn()
     cur = conn.cursor()
-    cur.execute(
-        "INSERT INTO memory_messages (user_id, role, content, created_at, embedding) VALUES (?, ?, ?, ?, ?)",
-        (user_id, role, content, datetime.utcnow().isoformat(), json.dumps(embedding) if embedding else None),
-    )
-    conn.commit()
-    conn.close()
+    done = 0
+    last_id = 0
+    while True:
+        cur.execute("""
+            SELECT id, user_id FROM memory_messages
+            WHERE id > ?
+            AND (embedding_q IS NULL OR hex(substr(embedding_q, 4, 1)) != ?)
+            AND (embedding IS NOT NULL OR shard_row IS NOT NULL)
+            ORDER BY id LIMIT ?
+        """, (last_id, stored_dtype, batch_size))
+        rows = cur.fetchall()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        by_user: Dict[int, List[int]] = {}
+        for _id, user_id in rows:
+            by_user.setdefault(user_id, []).append(_id)
+        updates = []
+        for user_id, ids in by_user.items():
+            for _id, vec in fetch_embeddings_by_ids(user_id, ids).items():
+                updates.append((pack_embedding(vec, model, QUANT_DTYPE), vec.shape[0], _id))
+        cur.executemany("UPDATE memory_messages SET embedding_q=?, embedding_dim=? WHERE id=?", updates)
+        conn.commit()
+        done += len(updates)
+    return done
+
+def add_message(user_id: int, role: str, content: str, embedding: Optional[List[float]] = None,
+                model: Optional[str] = None, mode: Optional[str] = None):
+    add_messages([(user_id, role, content, embedding, mode)], model=model)
+
+def _encode(user_id: int, embedding, model: str) -> Tuple[Optional[np.ndarray], tuple]:
+    """(normalized vector, (embedding, embedding_dim, shard_row, embedding_q)) for storage."""
+    if embedding is None or not len(embedding):
+        return None, (None, None, None, None)
+    # Vectors are normalized once here so retrieval is a plain dot product.
+    vec = normalize(embedding)
+    blob = shard_row = blob_q = None
+    if VECTOR_STORAGE == "shards":
+        shard_row = _append_to_shard(user_id, vec)
+    else:
+        blob = pack_embedding(vec, model)
+    if QUANTIZED:
+        blob_q = pack_embedding(vec, model, QUANT_DTYPE)
+    return vec, (blob, vec.shape[0], shard_row, blob_q)
+
+def add_messages(messages: List[Tuple[int, str, str, Optional[List[float]], Optional[str]]], model: Optional[str] = None):
+    """
+    Insert (user_id, role, content, embedding, mode) rows with one executemany
+    in a single transaction, then append them to any cached user matrices.
+    `model` is the embedding space the vectors came from (default: current).
+    """
+    if not messages:
+        return
+    model = model or _default_model()
+    version = _current_version()
+    created_at = datetime.utcnow().isoformat()
+    params = []
+    vecs = []
+    for user_id, role, content, embedding, mode in messages:
+        vec, stored = _encode(user_id, embedding, model)
+        labels = (model, version) if vec is not None else (None, None)
+        params.append((user_id, role, content, created_at, *stored, *labels, mode))
+        vecs.append(vec)
+
+    inserted = {}
+
+    def insert(cur):
+        cur.executemany(
+            "INSERT INTO memory_messages (user_id, role, content, created_at, embedding, embedding_dim, shard_row, embedding_q, embedding_model, embedding_version, mode) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            params,
+        )
+        cur.execute("SELECT last_insert_rowid()")
+        inserted["last_id"] = cur.fetchone()[0]
+
+    def cache_rows():
+        # AUTOINCREMENT ids inside one write transaction are consecutive.
+        first_id = inserted["last_id"] - len(params) + 1
+        for offset, ((user_id, role, content, _, _, _, shard_row, _, _, _, mode), vec) in enumerate(zip(params, vecs)):
+            if vec is not None:
+                row = {"id": first_id + offset, "role": role, "content": content, "created_at": created_at, "mode": mode}
+                vector_cache.append(user_id, model, row, vec, shard_row)
+
+    # Cached matrices only see the rows once they are committed.
+    run(insert, cache_rows)
 
-def fetch_messages_with_embeddings(user_id: int, limit: int = 500) -> List[Dict[str, Any]]:
+def update_message_embeddings(updates: List[Tuple[int, int, List[float]]], model: str, version: int):
+    """
+    Replace the stored vectors of existing rows, given (id, user_id, embedding),
+    in one transaction. Affected users' cached matrices are dropped.
+    """
+    params = []
+    for _id, user_id, embedding in updates:
+        vec, stored = _encode(user_id, embedding, model)
+        if vec is not None:
+            params.append((*stored, model, version, _id))
+    if not params:
+        return
+
+    def invalidate():
+        for user_id in {user_id for _, user_id, _ in updates}:
+            vector_cache.invalidate(user_id)
+
+    run(lambda cur: cur.executemany("""
+        UPDATE memory_messages
+        SET embedding=?, embedding_dim=?, shard_row=?, embedding_q=?, embedding_model=?, embedding_version=?
+        WHERE id=?
+    """, params), invalidate)
+
+def _space_filter(model: Optional[str]) -> Tuple[str, tuple]:
+    if model is None:
+        return "", ()
+    return " AND embedding_model=? AND embedding_version=?", (model, _current_version())
+
+def row_filter_sql(filters: Optional[RowFilter], table: str = "") -> Tuple[str, tuple]:
+    """SQL conditions (each prefixed with AND) and arguments for a RowFilter."""
+    if filters is None:
+        return "", ()
+    prefix = f"{table}." if table else ""
+    sql, args = [], []
+    if filters.mode is not None:
+        # Rows stored before modes were recorded (mode NULL) match every mode.
+        sql.append(f"({prefix}mode=? OR {prefix}mode IS NULL)")
+        args.append(filters.mode)
+    if filters.role is not None:
+        sql.append(f"{prefix}role=?")
+        args.append(filters.role)
+    if filters.since is not None:
+        sql.append(f"{prefix}created_at>=?")
+        args.append(filters.since.isoformat())
+    if filters.until is not None:
+        sql.append(f"{prefix}created_at<?")
+        args.append(filters.until.isoformat())
+    return "".join(f" AND {c}" for c in sql), tuple(args)
+
+def fetch_messages_with_embeddings(user_id: int, limit: int = 500, model: Optional[str] = None,
+                                   filters: Optional[RowFilter] = None) -> List[Dict[str, Any]]:
+    """
+    Newest messages for a user, optionally only those embedded in `model`'s
+    space at the current EMBED_VERSION and matching `filters`. Each
+    "embedding" is a read-only numpy view over the stored BLOB or the user's
+    memory-mapped shard (no copy, no JSON parsing).
+    """
+    space_sql, space_args = _space_filter(model)
+    filter_sql, filter_args = row_filter_sql(filters)
     conn = get_conn()
     cur = conn.cursor()
-    cur.execute("""
-        SELECT id, role, content, created_at, embedding
+    cur.execute(f"""
+        SELECT id, role, content, created_at, mode, embedding, embedding_dim, shard_row
         FROM memory_messages
         WHERE user_id=?
-        AND embedding IS NOT NULL
+        AND (embedding IS NOT NULL OR shard_row IS NOT NULL){space_sql}{filter_sql}
         ORDER BY id DESC
         LIMIT ?
-    """, (user_id, limit))
+    """, (user_id, *space_args, *filter_args, limit))
     rows = cur.fetchall()
-    conn.close()
 
+    shards: Dict[int, np.ndarray] = {}
     out = []
-    for _id, role, content, created_at, emb in rows:
+    for _id, role, content, created_at, mode, emb, dim, shard_row in rows:
         try:
-            vec = json.loads(emb) if emb else []
+            if shard_row is not None:
+                if dim not in shards:
+                    shards[dim] = open_shard(user_id, dim)
+                vec = shards[dim][shard_row]
+            else:
+                vec, _model = unpack_embedding(emb)
         except Exception:
-            vec = []
-        out.append({"id": _id, "role": role, "content": content, "created_at": created_at, "embedding": vec})
+            continue
+        out.append({"id": _id, "role": role, "content": content, "created_at": created_at, "mode": mode, "embedding": vec})
     return out
+
+def fetch_embeddings_by_ids(user_id: int, ids: List[int], model: Optional[str] = None) -> Dict[int, np.ndarray]:
+    """
+    Full-precision vectors for specific rows (used to rescore a shortlist),
+    optionally only those in `model`'s space.
+    """
+    if not ids:
+        return {}
+    space_sql, space_args = _space_filter(model)
+    conn = get_conn()
+    cur = conn.cursor()
+    marks = ",".join("?" * len(ids))
+    cur.execute(
+        f"SELECT id, embedding, embedding_dim, shard_row FROM memory_messages WHERE user_id=? AND id IN ({marks}){space_sql}",
+        (user_id, *ids, *space_args),
+    )
+    rows = cur.fetchall()
+
+    shards: Dict[int, np.ndarray] = {}
+    out = {}
+    for _id, emb, dim, shard_row in rows:
+        try:
+            if shard_row is not None:
+                if dim not in shards:
+                    shards[dim] = open_shard(user_id, dim)
+                out[_id] = shards[dim][shard_row]
+            elif emb is not None:
+                out[_id] = unpack_embedding(emb)[0]
+        except Exception:
+            continue
+    return out
+
+def load_user_vectors(user_id: int, model: str, dim: int) -> UserVectors:
+    """
+    Build a cache entry from the user's rows in `model`'s space whose vectors
+    have `dim` elements: the newest HISTORY_WINDOW of them, or the whole
+    history when it is 0.
+    """
+    if QUANTIZED:
+        return _load_quantized_vectors(user_id, model, dim)
+
+    if VECTOR_STORAGE == "shards" and not HISTORY_WINDOW:
+        entry = _load_mapped_vectors(user_id, model, dim)
+        if entry is not None:
+            return entry
+
+    entry = UserVectors(dim)
+    for item in reversed(fetch_messages_with_embeddings(user_id, limit=HISTORY_WINDOW or -1, model=model)):
+        vec = item.pop("embedding")
+        if vec.shape[0] == dim:
+            entry.append(item, vec)
+    return entry
+
+def _load_mapped_vectors(user_id: int, model: str, dim: int) -> Optional[MappedUserVectors]:
+    """
+    Zero-copy entry over the user's shard file. Only possible when the shard
+    holds exactly this space's vectors, in row-id order, with no gaps (a
+    re-embedded or foreign row breaks that); otherwise the caller falls back
+    to a copied matrix.
+    """
+    space_sql, space_args = _space_filter(model)
+    conn = get_conn()
+    cur = conn.cursor()
+    cur.execute(
+        "SELECT 1 FROM memory_messages WHERE user_id=? AND embedding IS NOT NULL LIMIT 1",
+        (user_id,),
+    )
+    has_blobs = cur.fetchone() is not None
+    cur.execute("SELECT COUNT(*) FROM memory_messages WHERE user_id=? AND embedding_dim=? AND shard_row IS NOT NULL", (user_id, dim))
+    in_shard = cur.fetchone()[0]
+    cur.execute(f"""
+        SELECT id, role, content, created_at, mode, shard_row
+        FROM memory_messages
+        WHERE user_id=? AND embedding_dim=? AND shard_row IS NOT NULL{space_sql}
+        ORDER BY id
+    """, (user_id, dim, *space_args))
+    rows = cur.fetchall()
+
+    if has_blobs or in_shard != len(rows) or any(shard_row != i for i, (*_, shard_row) in enumerate(rows)):
+        return None
+    entry = MappedUserVectors(dim, shard_path(user_id, dim))
+    for _id, role, content, created_at, mode, shard_row in rows:
+        entry.add_row({"id": _id, "role": role, "content": content, "created_at": created_at, "mode": mode})
+    return entry
+
+def _load_quantized_vectors(user_id: int, model: str, dim: int) -> UserVectors:
+    """Entry holding the quantized codes from embedding_q."""
+    space_sql, space_args = _space_filter(model)
+    conn = get_conn()
+    cur = conn.cursor()
+    cur.execute(f"""
+        SELECT id, role, content, created_at, mode, embedding_q
+        FROM memory_messages
+        WHERE user_id=? AND embedding_dim=? AND embedding_q IS NOT NULL{space_sql}
+        ORDER BY id DESC
+        LIMIT ?
+    """, (user_id, dim, *space_args, HISTORY_WINDOW or -1))
+    rows = cur.fetchall()
+
+    entry = UserVectors(dim, dtype=QUANT_DTYPE)
+    for _id, role, content, created_at, mode, blob in reversed(rows):
+        try:
+            codes, scale, _model = unpack_quantized(blob)
+        except Exception:
+            continue
+        row = {"id": _id, "role": role, "content": content, "created_at": created_at, "mode": mode}
+        if codes.dtype == entry.matrix.dtype:
+            entry.append_encoded(row, codes, scale)
+        else:
+            # Quantized under another VECTOR_QUANTIZATION (until
+            # quantize_existing_embeddings re-encodes it): convert here.
+            entry.append(row, codes.astype(np.float32) * np.float32(scale))
+    return entry
@@ -1,6 +1,12 @@
 # models/user.py
+from typing import Optional
 from pydantic import BaseModel, Field
 
 class LoginRequest(BaseModel):
     username: str
     password: str = Field(..., min_length=1)
+
+class UserModel(BaseModel):
+    id: int
+    username: str
+    mode: Optional[str] = None
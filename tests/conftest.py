@@ -0,0 +1,58 @@
+# tests/conftest.py
+"""
+Test configuration. Settings are read from the environment at import time,
+so they are fixed here before any application module is imported: a
+throwaway database, a signing key, and the offline hashing embedder.
+"""
+import os
+import tempfile
+
+_tmp = tempfile.mkdtemp(prefix="ai-memory-tests-")
+os.environ.setdefault("DB_FILE", os.path.join(_tmp, "test.db"))
+os.environ.setdefault("VECTOR_SHARD_DIR", os.path.join(_tmp, "vector_shards"))
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ.setdefault("EMBED_MODEL", "local-hash-64")
+os.environ.setdefault("EMBED_FALLBACK", "")
+
+import pytest
+
+
+@pytest.fixture
+def db():
+    """The migrated test database, emptied of messages, reminders and job state afterwards."""
+    from db.connection import get_conn
+    from memory.long_term import init_db
+    from memory.vector_cache import vector_cache
+
+    init_db()
+    yield get_conn()
+    conn = get_conn()
+    conn.execute("DELETE FROM memory_messages")
+    conn.execute("DELETE FROM backfill_state")
+    conn.execute("DELETE FROM reminders")
+    conn.commit()
+    vector_cache.invalidate()
+
+
+@pytest.fixture
+def client(db):
+    """The API, with its startup and shutdown hooks run."""
+    from fastapi.testclient import TestClient
+    import main
+    from auth.rate_limit import ip_limiter, user_limiter
+
+    # Every test client request comes from the same address.
+    ip_limiter.reset()
+    user_limiter.reset()
+    with TestClient(main.app) as client:
+        yield client
+
+
+@pytest.fixture
+def signup(client):
+    """signup(username) -> Authorization headers of the new user."""
+    def signup(username: str, password: str = "pw-123456"):
+        response = client.post("/signup", json={"username": username, "password": password})
+        assert response.status_code == 200, response.text
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+    return signup
@@ -0,0 +1,43 @@
+# tests/test_async_services.py
+import asyncio
+import threading
+import time
+
+from db import executor
+from memory.async_services import AsyncMemoryService
+
+
+def test_db_calls_run_on_a_bounded_pool_off_the_loop():
+    threads = set()
+
+    def blocking_call():
+        threads.add(threading.current_thread().name)
+        time.sleep(0.05)
+
+    async def main():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.005)
+
+        tick = asyncio.create_task(ticker())
+        await asyncio.gather(*(executor.run_db(blocking_call) for _ in range(12)))
+        tick.cancel()
+        return ticks
+
+    ticks = asyncio.run(main())
+
+    assert ticks > 5  # the event loop kept running
+    assert 0 < len(threads) <= executor.DB_EXECUTOR_THREADS
+    assert all(name.startswith("db") for name in threads)
+
+
+def test_async_memory_round_trip(db):
+    async def main():
+        await AsyncMemoryService.remember_many(7, "Build", {"stack": "python", "editor": "vim"})
+        return await AsyncMemoryService.recall_many(7, "Build", ["stack", "editor", "missing"])
+
+    assert asyncio.run(main()) == {"stack": "python", "editor": "vim"}
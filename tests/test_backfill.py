@@ -0,0 +1,61 @@
+# tests/test_backfill.py
+from learning import embedder
+from memory.vector_store import add_messages
+from workers.backfill import EmbeddingBackfill
+
+SPACE = embedder.embedding_space()
+
+
+def _store(texts):
+    add_messages([(1, "user", text, None, None) for text in texts])
+
+
+def _embedded(db):
+    return {content: model for content, model in db.execute("SELECT content, embedding_model FROM memory_messages")}
+
+
+def _fake_api(monkeypatch, up=True):
+    """Like the embeddings API: one bad input ("POISON") fails the whole request."""
+    calls = []
+
+    def embed(texts):
+        calls.append(list(texts))
+        if not up or any("POISON" in t for t in texts):
+            return [([], "") for _ in texts]
+        return [([1.0] + [0.0] * 63, SPACE) for _ in texts]
+
+    monkeypatch.setattr(embedder, "embed_texts_with_model", embed)
+    monkeypatch.setattr(embedder.backend, "embed", lambda texts: [[] if not up else [1.0]] * len(texts))
+    return calls
+
+
+def test_bad_row_is_skipped_after_max_attempts(db, monkeypatch):
+    _store(["one", "two", "POISON", "four", "five"])
+    _fake_api(monkeypatch)
+    job = EmbeddingBackfill(batch_size=5, max_attempts=2)
+
+    runs = 0
+    while job.run_batch():
+        runs += 1
+        assert runs < 10
+
+    embedded = _embedded(db)
+    assert embedded["POISON"] is None
+    assert all(embedded[t] == SPACE for t in ("one", "two", "four", "five"))
+    assert job.skipped == 1
+    assert not job.stalled
+
+
+def test_outage_does_not_give_up_rows(db, monkeypatch):
+    _store(["one", "two", "three"])
+    calls = _fake_api(monkeypatch, up=False)
+    job = EmbeddingBackfill(batch_size=3, max_attempts=2)
+
+    for _ in range(5):
+        assert job.run_batch()
+        assert job.stalled
+
+    assert job.skipped == 0
+    assert job._checkpoint(job.job_name(SPACE, embedder.EMBED_VERSION)) == 0
+    # One batch request plus one single-row retry per pass.
+    assert len(calls) == 10
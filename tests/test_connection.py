@@ -0,0 +1,53 @@
+# tests/test_connection.py
+import threading
+
+from db import connection
+from db.connection import discard_open_transaction, get_conn
+
+
+def _in_thread(fn):
+    out = {}
+    thread = threading.Thread(target=lambda: out.setdefault("result", fn()))
+    thread.start()
+    thread.join()
+    return out["result"]
+
+
+def test_one_wal_connection_per_thread(db):
+    mine = get_conn()
+
+    assert get_conn() is mine
+    assert _in_thread(get_conn) is not mine
+    assert mine.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_leftover_transaction_is_discarded(db):
+    conn = get_conn()
+    conn.execute("CREATE TABLE IF NOT EXISTS t_conn (x INTEGER)")
+    conn.commit()
+    conn.execute("INSERT INTO t_conn VALUES (1)")  # a failed write path never committed
+    assert conn.in_transaction
+
+    assert discard_open_transaction(conn)
+    assert not conn.in_transaction
+
+    def write():
+        other = get_conn()
+        other.execute("INSERT INTO t_conn VALUES (2)")
+        other.commit()
+        return True
+
+    # The write lock was released, so another thread can write.
+    assert _in_thread(write)
+    assert [x for x, in conn.execute("SELECT x FROM t_conn")] == [2]
+    conn.execute("DROP TABLE t_conn")
+    conn.commit()
+
+
+def test_close_all_makes_threads_reconnect(db):
+    before = get_conn()
+    connection.close_all()
+
+    after = get_conn()
+    assert after is not before
+    assert after.execute("SELECT 1").fetchone() == (1,)
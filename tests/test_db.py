@@ -0,0 +1,19 @@
+# tests/test_db.py
+import pytest
+
+from db.base import Database
+from db.session import BACKENDS
+
+
+@pytest.mark.parametrize("name", sorted(BACKENDS))
+def test_backends_implement_the_interface(name):
+    assert isinstance(BACKENDS[name](), Database)
+
+
+def test_incomplete_backend_fails_at_creation():
+    class Partial(Database):
+        def create_user(self, username, hashed_password):
+            return None
+
+    with pytest.raises(TypeError):
+        Partial()
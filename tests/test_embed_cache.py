@@ -0,0 +1,34 @@
+# tests/test_embed_cache.py
+from learning.embed_cache import EmbeddingCache, init_embedding_cache
+
+VEC = [0.5, 0.25]  # exact in float32
+
+
+def test_memory_then_database_tier(db):
+    cache = EmbeddingCache(max_entries=1)
+    cache.put("model-a", "hello", VEC)
+    assert cache.get("model-a", "hello") == VEC
+
+    cache.put("model-a", "other", VEC)  # pushes "hello" out of the LRU
+    assert cache.get("model-a", "hello") == VEC
+    stats = cache.stats()
+    assert (stats["memory_hits"], stats["db_hits"]) == (1, 1)
+
+
+def test_entries_are_keyed_by_model(db):
+    cache = EmbeddingCache()
+    cache.put("model-a", "keyed", VEC)
+
+    assert cache.get("model-b", "keyed") is None
+
+
+def test_init_keeps_every_configured_space(db):
+    cache = EmbeddingCache()
+    for model in ("primary", "fallback", "retired"):
+        cache.put(model, "spaces", VEC)
+    init_embedding_cache(["primary", "fallback"])
+    cache.invalidate()
+
+    assert cache.get("primary", "spaces") == VEC
+    assert cache.get("fallback", "spaces") == VEC
+    assert cache.get("retired", "spaces") is None
@@ -0,0 +1,78 @@
+# tests/test_embedder.py
+import threading
+import time
+
+import pytest
+
+from learning.backends import EmbeddingBackend
+from learning.embedder import _Coalescer, get_backend
+
+
+def _api(texts):
+    """Like the embeddings API: one bad input fails the whole request."""
+    if any("BAD" in t for t in texts):
+        raise ValueError("invalid input")
+    return [[float(len(t))] for t in texts]
+
+
+def _concurrently(coalescer, *calls):
+    results = [None] * len(calls)
+
+    def call(i, texts):
+        results[i] = coalescer.embed(texts)
+
+    threads = [threading.Thread(target=call, args=(i, texts)) for i, texts in enumerate(calls)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def test_one_callers_bad_input_does_not_blank_others():
+    coalescer = _Coalescer(_api, window_ms=200, max_batch=64, concurrency=1)
+
+    good, bad = _concurrently(coalescer, ["hello", "world!"], ["fine", "BAD"])
+
+    assert good == [[5.0], [6.0]]
+    assert bad == [[], []]
+    stats = coalescer.stats()
+    assert stats["batches"] == 1
+    assert stats["resends"] == 2
+
+
+def test_avg_wait_counts_every_queued_request():
+    coalescer = _Coalescer(_api, window_ms=20, max_batch=64, concurrency=1)
+
+    coalescer.embed(["same", "same", "other"])
+
+    stats = coalescer.stats()
+    assert (stats["requests"], stats["inputs"]) == (3, 2)
+    assert abs(stats["avg_wait_ms"] - stats["max_wait_ms"]) < 1e-6
+
+
+def test_caller_gives_up_when_the_batch_hangs():
+    release = threading.Event()
+
+    def hanging(texts):
+        release.wait()
+        return _api(texts)
+
+    coalescer = _Coalescer(hanging, window_ms=1, max_batch=64, concurrency=1, timeout=0.1)
+    try:
+        start = time.monotonic()
+        assert coalescer.embed(["hello"]) == [[]]
+        assert time.monotonic() - start < 2
+        assert coalescer.stats()["timeouts"] == 1
+    finally:
+        release.set()
+
+
+def test_incomplete_embedding_backend_fails_at_creation():
+    class NoEmbed(EmbeddingBackend):
+        name = "none"
+
+    with pytest.raises(TypeError):
+        NoEmbed()
+    assert isinstance(get_backend("local-hash-32"), EmbeddingBackend)
+    assert isinstance(get_backend("text-embedding-3-small"), EmbeddingBackend)
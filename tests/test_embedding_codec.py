@@ -0,0 +1,30 @@
+# tests/test_embedding_codec.py
+import json
+
+import numpy as np
+
+from memory.embedding_codec import pack_embedding, unpack_embedding
+from memory.vector_store import migrate_json_embeddings
+
+
+def test_pack_round_trip_keeps_model_and_values():
+    vec = np.array([0.5, -0.25, 0.125], dtype=np.float32)
+
+    out, model = unpack_embedding(pack_embedding(vec, "some-model"))
+
+    assert model == "some-model"
+    assert out.dtype == np.float32
+    assert out.tolist() == vec.tolist()
+
+
+def test_legacy_json_embeddings_become_normalized_blobs(db):
+    db.execute("INSERT INTO memory_messages (user_id, role, content, created_at, embedding) VALUES (1, 'user', 'old', '2024-01-01T00:00:00', ?)",
+               (json.dumps([3.0, 4.0]),))
+    db.commit()
+
+    assert migrate_json_embeddings() == 1
+    assert migrate_json_embeddings() == 0
+
+    blob, = db.execute("SELECT embedding FROM memory_messages").fetchone()
+    vec, _ = unpack_embedding(blob)
+    assert np.allclose(vec, [0.6, 0.8])
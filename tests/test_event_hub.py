@@ -0,0 +1,72 @@
+# tests/test_event_hub.py
+import asyncio
+import threading
+
+from workers.event_hub import EventHub
+
+
+def test_publish_from_another_thread_reaches_the_stream():
+    hub = EventHub()
+
+    async def main():
+        sub = hub.subscribe(1)
+        threading.Thread(target=hub.publish, args=(1, "reminder", {"text": "hi"})).start()
+        event = await asyncio.wait_for(sub.queue.get(), 5)
+        hub.unsubscribe(sub)
+        return event
+
+    event = asyncio.run(main())
+
+    assert (event["type"], event["data"]) == ("reminder", {"text": "hi"})
+
+
+def test_events_while_disconnected_are_replayed_once():
+    hub = EventHub()
+    hub.publish(1, "reminder", {"n": 1})
+    hub.publish(1, "reminder", {"n": 2})
+    hub.publish(2, "reminder", {"n": 3})
+
+    async def drain():
+        sub = hub.subscribe(1)
+        hub.unsubscribe(sub)
+        return [sub.queue.get_nowait()["data"]["n"] for _ in range(sub.queue.qsize())]
+
+    assert asyncio.run(drain()) == [1, 2]
+    assert asyncio.run(drain()) == []
+    assert hub.pending(1) == []
+
+
+def test_last_event_id_replays_what_was_missed():
+    hub = EventHub()
+    first = hub.publish(1, "reminder", {"n": 1})
+    hub.publish(1, "reminder", {"n": 2})
+
+    async def reconnect():
+        sub = hub.subscribe(1, last_event_id=first)
+        hub.unsubscribe(sub)
+        return [sub.queue.get_nowait()["data"]["n"] for _ in range(sub.queue.qsize())]
+
+    assert asyncio.run(reconnect()) == [2]
+
+
+def test_lagging_stream_is_ended_not_grown():
+    hub = EventHub(buffer_size=3)
+
+    async def main():
+        sub = hub.subscribe(1)
+        for n in range(10):
+            hub.publish(1, "reminder", {"n": n})
+            await asyncio.sleep(0)  # the put runs; the stream never reads
+        items = [sub.queue.get_nowait() for _ in range(sub.queue.qsize())]
+        return sub, items
+
+    sub, items = asyncio.run(main())
+
+    assert sub.closed
+    assert items[-1] is None
+    assert len(items) <= 4
+    assert hub.stats()["subscribers"] == 0
+
+
+def test_events_endpoint_requires_a_token(client):
+    assert client.get("/events").status_code == 401
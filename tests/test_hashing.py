@@ -0,0 +1,53 @@
+# tests/test_hashing.py
+import asyncio
+
+import pytest
+
+from auth import hashing
+from auth.hashing import HashingBusy, hash_password_async, verify_password_async
+from auth.rate_limit import RateLimiter
+
+
+def test_hash_and_verify_in_the_pool():
+    async def main():
+        hashed = await hash_password_async("correct horse")
+        return hashed, await verify_password_async("correct horse", hashed), await verify_password_async("wrong", hashed)
+
+    hashed, (ok, _), (bad, _) = asyncio.run(main())
+
+    assert hashed.startswith("$argon2")
+    assert ok and not bad
+
+
+def test_saturated_pool_refuses_instead_of_queueing(monkeypatch):
+    monkeypatch.setattr(hashing, "_in_flight", hashing.HASH_WORKERS + hashing.HASH_QUEUE_LIMIT)
+
+    with pytest.raises(HashingBusy):
+        asyncio.run(hash_password_async("pw"))
+
+
+def test_bucket_allows_a_burst_then_waits():
+    limiter = RateLimiter(rate_per_minute=60, burst=3)
+
+    assert [limiter.acquire("k") for _ in range(3)] == [0.0, 0.0, 0.0]
+    wait = limiter.acquire("k")
+    assert 0 < wait <= 1.0
+    assert limiter.acquire("other") == 0.0
+
+
+def test_repeated_failed_logins_get_429(client, signup):
+    signup("rate-user")
+    statuses = [client.post("/login", json={"username": "rate-user", "password": "wrong"}).status_code
+                for _ in range(8)]
+
+    assert statuses[0] == 401
+    assert statuses[-1] == 429
+
+
+def test_busy_hashing_answers_429(client, monkeypatch):
+    monkeypatch.setattr(hashing, "_in_flight", hashing.HASH_WORKERS + hashing.HASH_QUEUE_LIMIT)
+
+    response = client.post("/signup", json={"username": "busy-user", "password": "pw-123456"})
+
+    assert response.status_code == 429
+    assert "Retry-After" in response.headers
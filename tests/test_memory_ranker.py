@@ -0,0 +1,62 @@
+# tests/test_memory_ranker.py
+import numpy as np
+import pytest
+
+from learning import memory_ranker
+
+DIM = 8
+
+
+def _unit(*components):
+    v = np.zeros(DIM, dtype=np.float32)
+    v[:len(components)] = components
+    return v / np.linalg.norm(v)
+
+
+QUERY = _unit(1.0)
+# id -> vector; cosine with QUERY falls as the id grows.
+VECTORS = {
+    1: _unit(1.0, 0.1),
+    2: _unit(1.0, 0.5),
+    3: _unit(1.0, 1.0),
+    4: _unit(1.0, 2.0),
+    5: _unit(0.1, 1.0),  # score ~0.1: below SCORE_THRESHOLD
+    6: _unit(-1.0, 1.0),  # points away from the query
+}
+
+
+def _hit(i):
+    return {"id": i, "role": "user", "content": f"message {i}", "created_at": "2024-01-01T00:00:00", "mode": None}
+
+
+@pytest.fixture
+def fixture(monkeypatch):
+    monkeypatch.setattr(memory_ranker, "fetch_embeddings_by_ids",
+                        lambda user_id, ids, model=None: {i: VECTORS[i] for i in ids})
+    dense = [{"score": float(VECTORS[i] @ QUERY), **_hit(i), "embedding": VECTORS[i]} for i in (1, 2, 3, 4)]
+    # BM25 ranks the low-similarity messages first.
+    sparse = [_hit(i) for i in (5, 6, 4, 3)]
+    return dense, sparse
+
+
+def test_fusion_keeps_vector_cutoff_and_top_hits(fixture):
+    dense, sparse = fixture
+
+    fused = memory_ranker._fuse(1, QUERY, "space", dense, sparse, k=3)
+
+    assert {m["id"] for m in fused} <= {1, 2, 3, 4}
+    assert all(m["score"] > memory_ranker.SCORE_THRESHOLD for m in fused)
+    # Messages both lists agree on rank first; the best vector hit stays in the top k.
+    assert {m["id"] for m in fused[:2]} == {3, 4}
+    assert 1 in {m["id"] for m in fused}
+
+
+def test_keyword_bypass_admits_low_similarity_hits(fixture, monkeypatch):
+    dense, sparse = fixture
+    monkeypatch.setattr(memory_ranker, "HYBRID_KEYWORD_BYPASS", True)
+
+    fused = memory_ranker._fuse(1, QUERY, "space", dense, sparse, k=6)
+
+    ids = {m["id"] for m in fused}
+    assert 5 in ids
+    assert 6 not in ids
@@ -0,0 +1,52 @@
+# tests/test_migrations.py
+import pytest
+
+from db import connection
+from db.base import reminder_epoch
+from db.migrations import MIGRATIONS, current_version, migrate
+
+
+@pytest.fixture
+def fresh_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(connection, "DB_FILE", str(tmp_path / "fresh.db"))
+    yield connection.get_conn()
+    connection.close_conn()
+
+
+def test_migrates_step_by_step_and_is_idempotent(fresh_db):
+    assert migrate(target=5) == [1, 2, 3, 4, 5]
+    fresh_db.execute(
+        "INSERT INTO reminders (user_id, text, time, status) VALUES (1, 'call', '2030-01-01T09:00:00', 'pending')")
+    fresh_db.commit()
+
+    assert migrate() == [6]
+    assert migrate() == []
+    assert current_version() == MIGRATIONS[-1][0]
+    due, = fresh_db.execute("SELECT due_epoch FROM reminders").fetchone()
+    assert due == reminder_epoch("2030-01-01T09:00:00")
+
+
+def test_hot_paths_use_their_indexes(fresh_db):
+    migrate()
+
+    def plan(sql, args):
+        return " ".join(row[-1] for row in fresh_db.execute(f"EXPLAIN QUERY PLAN {sql}", args))
+
+    assert "idx_reminders_status_due" in plan(
+        "SELECT id FROM reminders WHERE status='pending' AND due_epoch <= ?", (0,))
+    assert "idx_memory_messages_user_mode" in plan(
+        "SELECT id FROM memory_messages WHERE user_id=? AND mode=? ORDER BY id DESC", (1, "Build"))
+    assert "idx_memory_user_mode_timestamp" in plan(
+        "SELECT key FROM memory WHERE user_id=? AND mode=? ORDER BY timestamp", (1, "Build"))
+
+
+def test_upgrades_a_database_created_before_versioning(fresh_db):
+    fresh_db.execute("CREATE TABLE users (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT UNIQUE, password_hash TEXT)")
+    fresh_db.execute("INSERT INTO users (username, password_hash) VALUES ('old', 'x')")
+    fresh_db.commit()
+
+    migrate()
+
+    columns = {row[1] for row in fresh_db.execute("PRAGMA table_info(users)")}
+    assert "mode" in columns
+    assert fresh_db.execute("SELECT username FROM users").fetchall() == [("old",)]
@@ -0,0 +1,49 @@
+# tests/test_profile.py
+import time
+
+from memory.profile_cache import ProfileCache
+
+
+def test_stale_read_does_not_overwrite_newer_update():
+    cache = ProfileCache()
+    generation = cache.generation()  # a read starts
+    cache.invalidate(1)  # an update commits meanwhile
+    cache.put(1, {"fullName": "old"}, generation)
+
+    assert cache.get(1) is None
+
+
+def test_entries_expire_after_ttl():
+    cache = ProfileCache(ttl=0.05)
+    cache.put(1, {"fullName": "A"})
+    assert cache.get(1) is not None
+    time.sleep(0.1)
+    assert cache.get(1) is None
+
+
+def test_zero_ttl_disables_caching():
+    cache = ProfileCache(ttl=0)
+    cache.put(1, {"fullName": "A"})
+    assert cache.get(1) is None
+
+
+def _profile(name):
+    return {"fullName": name, "email": "a@example.com", "aiPersonality": "", "preferences": "",
+            "notificationsEnabled": True}
+
+
+def test_etag_revalidation(client, signup):
+    auth = signup("profile-user")
+
+    client.post("/profile/update", json=_profile("Ada"), headers=auth)
+    first = client.get("/profile/", headers=auth)
+    assert first.json()["fullName"] == "Ada"
+    etag = first.headers["ETag"]
+
+    assert client.get("/profile/", headers={**auth, "If-None-Match": etag}).status_code == 304
+
+    client.post("/profile/update", json=_profile("Grace"), headers=auth)
+    changed = client.get("/profile/", headers={**auth, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.json()["fullName"] == "Grace"
+    assert changed.headers["ETag"] != etag
@@ -0,0 +1,58 @@
+# tests/test_quantization.py
+import numpy as np
+import pytest
+
+from learning import memory_ranker
+from learning.embedder import embedding_space
+from memory import vector_store
+from memory.embedding_codec import DTYPE_F16, DTYPE_I8, DTYPES, quantize
+from memory.vector_cache import vector_cache
+
+DIM = 64
+
+
+def _vecs(n, seed=0):
+    m = np.random.default_rng(seed).standard_normal((n, DIM)).astype(np.float32)
+    return m / np.linalg.norm(m, axis=1, keepdims=True)
+
+
+def _quantization(monkeypatch, dtype):
+    monkeypatch.setattr(vector_store, "QUANTIZED", True)
+    monkeypatch.setattr(vector_store, "QUANT_DTYPE", dtype)
+    vector_cache.invalidate()
+
+
+@pytest.mark.parametrize("dtype", [DTYPE_F16, DTYPE_I8])
+def test_quantize_round_trip_error_is_small(dtype):
+    vec = _vecs(1)[0]
+    codes, scale = quantize(vec, dtype)
+
+    assert codes.dtype == DTYPES[dtype]
+    assert np.abs(codes.astype(np.float32) * scale - vec).max() < 0.01
+
+
+def test_rescored_search_matches_exact_scan(db, monkeypatch):
+    _quantization(monkeypatch, DTYPE_I8)
+    vecs = _vecs(200)
+    vector_store.add_messages([(1, "user", f"m{i}", vec.tolist(), None) for i, vec in enumerate(vecs)])
+    q = vecs[17]
+
+    found = memory_ranker.search_vectors(1, q, 5, embedding_space())
+
+    expected = np.argsort(-(vecs @ q))[:5]
+    assert [m["content"] for m in found] == [f"m{i}" for i in expected]
+    assert found[0]["score"] == pytest.approx(1.0, abs=1e-5)
+
+
+def test_switching_dtype_keeps_history_searchable(db, monkeypatch):
+    _quantization(monkeypatch, DTYPE_I8)
+    vecs = _vecs(20, seed=1)
+    vector_store.add_messages([(1, "user", f"m{i}", vec.tolist(), None) for i, vec in enumerate(vecs)])
+
+    _quantization(monkeypatch, DTYPE_F16)
+    entry = vector_store.load_user_vectors(1, embedding_space(), DIM)
+    assert entry.size == 20 and entry.matrix.dtype == DTYPES[DTYPE_F16]
+
+    assert vector_store.quantize_existing_embeddings() == 20
+    dtypes = {blob[3] for blob, in db.execute("SELECT embedding_q FROM memory_messages")}
+    assert dtypes == {DTYPE_F16}
@@ -0,0 +1,94 @@
+# tests/test_reminders.py
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from db.memory_backend import InMemoryDatabase
+from db.sqlite_backend import SQLiteDatabase
+
+
+def _at(seconds: float) -> str:
+    """Server-local time `seconds` from now, as the reminder parser stores it."""
+    return (datetime.now() + timedelta(seconds=seconds)).isoformat()
+
+
+@pytest.fixture(params=["sqlite", "memory"])
+def backend(request, db):
+    return SQLiteDatabase() if request.param == "sqlite" else InMemoryDatabase()
+
+
+def test_sweep_fires_due_reminders_once(backend):
+    created = datetime.utcnow().isoformat()
+    backend.add_reminder(1, "once", _at(-60), False, created)
+    backend.add_reminder(2, "kept", _at(-30), True, created)
+    backend.add_reminder(1, "later", _at(3600), False, created)
+
+    due = backend.take_due_reminders(time.time(), created)
+
+    assert [(user_id, text, keep) for _, user_id, text, _, keep in due] == [(1, "once", False), (2, "kept", True)]
+    assert backend.take_due_reminders(time.time(), created) == []
+    assert [text for _, _, text, _, _ in backend.upcoming_reminders(10)] == ["later"]
+    assert [(text, status) for _, text, _, status, _ in backend.list_reminders(2, include_fired=True)] == [("kept", "fired")]
+
+
+def test_concurrent_sweeps_claim_each_reminder_once(db):
+    backend = SQLiteDatabase()
+    created = datetime.utcnow().isoformat()
+    for i in range(50):
+        backend.add_reminder(i % 5, f"r{i}", _at(-1), False, created)
+
+    claimed = []
+    lock = threading.Lock()
+
+    def sweep():
+        rows = backend.take_due_reminders(time.time(), created)
+        with lock:
+            claimed.extend(r[0] for r in rows)
+
+    threads = [threading.Thread(target=sweep) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(claimed) == len(set(claimed)) == 50
+
+
+@pytest.fixture
+def scheduler(db, monkeypatch):
+    from workers import reminder
+    scheduler = reminder.ReminderScheduler(max_sleep=30)
+    monkeypatch.setattr(reminder, "reminder_scheduler", scheduler)
+    yield scheduler
+    scheduler.stop()
+
+
+def test_new_reminder_fires_on_time_without_polling(scheduler):
+    from memory.long_term import ReminderService
+    from workers.event_hub import event_hub
+
+    scheduler.start()
+    time.sleep(0.05)  # asleep for max_sleep with nothing due
+    ReminderService.add_reminder(301, "stand up", _at(0.3))
+
+    deadline = time.monotonic() + 5
+    while not event_hub.pending(301) and time.monotonic() < deadline:
+        time.sleep(0.02)
+
+    events = event_hub.pending(301)
+    assert [e["data"]["text"] for e in events] == ["stand up"]
+    assert scheduler.fired == 1
+
+
+def test_long_overdue_reminders_expire_unfired(scheduler):
+    from memory.long_term import ReminderService
+    from workers.event_hub import event_hub
+
+    ReminderService.add_reminder(302, "missed", _at(-3 * 3600))
+    scheduler._load()
+
+    assert scheduler.run_due() is None
+    assert scheduler.expired == 1
+    assert event_hub.pending(302) == []
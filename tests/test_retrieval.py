@@ -0,0 +1,73 @@
+# tests/test_retrieval.py
+import numpy as np
+
+from memory import retrieval
+from memory.vector_cache import UserVectors
+
+DIM = 16
+
+
+def _unit_rows(n, seed):
+    m = np.random.default_rng(seed).standard_normal((n, DIM)).astype(np.float32)
+    return m / np.linalg.norm(m, axis=1, keepdims=True)
+
+
+def _entry(vecs):
+    entry = UserVectors(DIM, window=0)
+    for i, vec in enumerate(vecs):
+        entry.append({"id": i, "role": "user", "content": "", "created_at": None}, vec)
+    return entry
+
+
+def test_top_k_scores_matches_sort():
+    matrix = _unit_rows(500, 0)
+    q = matrix[7]
+
+    idx, scores = retrieval.top_k_scores(matrix, q, 10, -1.0)
+
+    expected = np.argsort(-(matrix @ q), kind="stable")[:10]
+    assert idx.tolist() == expected.tolist()
+    assert np.all(np.diff(scores) <= 0)
+
+
+def test_index_catches_up_rows_appended_while_training():
+    vecs = _unit_rows(600, 1)
+    entry = _entry(vecs[:500])
+    generation = entry.claim_index_build()
+    trained_on, _ = entry.view()
+    for vec in vecs[500:]:
+        entry.append({"id": 0, "role": "user", "content": "", "created_at": None}, vec)
+
+    retrieval._build_index(entry, trained_on, generation)
+
+    assert entry.index is not None
+    assert entry.index.size == entry.size == 600
+    # Every position is in exactly one list when all lists are probed.
+    everything = np.sort(entry.index.candidates(vecs[0], nprobe=entry.index.nlist))
+    assert everything.tolist() == list(range(600))
+
+
+def test_index_built_for_an_old_generation_is_discarded():
+    entry = _entry(_unit_rows(100, 2))
+    generation = entry.claim_index_build()
+    matrix, _ = entry.view()
+    entry.generation += 1  # positions shifted meanwhile
+
+    retrieval._build_index(entry, matrix, generation)
+
+    assert entry.index is None
+    assert entry.claim_index_build() is not None
+
+
+def test_ann_search_finds_the_exact_neighbours(monkeypatch):
+    monkeypatch.setattr(retrieval, "ANN_MIN_ROWS", 100)
+    vecs = _unit_rows(2000, 3)
+    entry = _entry(vecs)
+    matrix, _ = entry.view()
+    retrieval._build_index(entry, matrix, entry.claim_index_build())
+    q = vecs[42]
+
+    idx, _ = retrieval.search(entry, matrix, q, 5, 0.0, nprobe=entry.index.nlist)
+
+    exact, _ = retrieval.top_k_scores(matrix, q, 5, 0.0)
+    assert idx.tolist() == exact.tolist()
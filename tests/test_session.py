@@ -0,0 +1,54 @@
+# tests/test_session.py
+import asyncio
+import time
+
+from auth import session as session_module
+from auth.session import Session, SessionCache, load_session, session_cache
+
+
+def test_cache_expires_and_evicts():
+    cache = SessionCache(max_entries=2, ttl=0.05)
+    for i in range(3):
+        cache.put(Session(i, f"user{i}", None))
+
+    assert cache.get("user0") is None  # least recently used
+    assert cache.get("user2") == Session(2, "user2", None)
+    time.sleep(0.1)
+    assert cache.get("user2") is None
+
+
+def test_set_mode_updates_in_place():
+    cache = SessionCache()
+    cache.put(Session(1, "ada", None))
+    cache.set_mode("ada", "Build")
+    cache.set_mode("nobody", "Build")
+
+    assert cache.get("ada").mode == "Build"
+    assert cache.get("nobody") is None
+
+
+def test_warm_session_needs_no_database_lookup(monkeypatch):
+    lookups = []
+
+    async def get_user(username):
+        lookups.append(username)
+        return {"id": 5, "username": username, "mode": "VIP"}
+
+    monkeypatch.setattr(session_module.AsyncUserService, "get_user", get_user)
+    session_cache.invalidate("warm-user")
+
+    first = asyncio.run(load_session("warm-user"))
+    second = asyncio.run(load_session("warm-user"))
+
+    assert first == second == Session(5, "warm-user", "VIP")
+    assert lookups == ["warm-user"]
+
+
+def test_mode_change_is_persisted_and_cached(client, signup):
+    auth = signup("mode-user")
+
+    assert client.post("/mode", json={"mode": "Build"}, headers=auth).status_code == 200
+
+    assert session_cache.get("mode-user").mode == "Build"
+    session_cache.invalidate("mode-user")
+    assert asyncio.run(load_session("mode-user")).mode == "Build"
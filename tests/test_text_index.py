@@ -0,0 +1,36 @@
+# tests/test_text_index.py
+import pytest
+
+from memory import text_index
+from memory.vector_cache import RowFilter
+from memory.vector_store import add_messages
+
+
+@pytest.fixture
+def corpus(db, monkeypatch):
+    if not text_index.available():
+        pytest.skip("SQLite built without FTS5")
+    monkeypatch.setattr(text_index, "KEYWORD_COMMON_MIN_DOCS", 5)
+    rows = [(1, "user", f"hello there, just checking in {i}", None, None) for i in range(10)]
+    rows += [
+        (1, "user", "my dog barkley loves the beach", None, "VIP"),
+        (2, "user", "barkley is also the name of my cat", None, None),
+        (1, "assistant", "error E1234 in the build", None, "Build"),
+    ]
+    add_messages(rows)
+
+
+def test_query_terms_drop_stopwords():
+    assert text_index.query_terms("What is THE error in my build?") == ["error", "build"]
+
+
+def test_common_terms_are_not_searched(corpus):
+    assert text_index.keyword_search(1, "hello there", 5) == []
+    hits = text_index.keyword_search(1, "hello, tell me about barkley", 5)
+    assert [h["content"] for h in hits] == ["my dog barkley loves the beach"]
+
+
+def test_results_are_scoped_to_user_and_filters(corpus):
+    assert [h["content"] for h in text_index.keyword_search(2, "barkley", 5)] == ["barkley is also the name of my cat"]
+    assert text_index.keyword_search(1, "E1234", 5, RowFilter(mode="VIP")) == []
+    assert len(text_index.keyword_search(1, "E1234", 5, RowFilter(mode="Build", role="assistant"))) == 1
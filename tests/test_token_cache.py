@@ -0,0 +1,51 @@
+# tests/test_token_cache.py
+import time
+
+from auth.token_cache import TokenCache, token_cache
+
+
+def test_entry_never_outlives_token_expiry():
+    cache = TokenCache(ttl=3600)
+    cache.put("soon", {"sub": "ada", "exp": time.time() + 0.05})
+    cache.put("expired", {"sub": "ada", "exp": time.time() - 1})
+
+    assert cache.get("soon")["sub"] == "ada"
+    assert cache.get("expired") is None
+    time.sleep(0.1)
+    assert cache.get("soon") is None
+
+
+def test_revoked_token_is_refused_and_not_recached():
+    cache = TokenCache()
+    payload = {"sub": "ada", "exp": time.time() + 60}
+    cache.put("tok", payload)
+
+    cache.revoke("tok", payload["exp"])
+    cache.put("tok", payload)  # e.g. a request that decoded it concurrently
+
+    assert cache.get("tok") is None
+    assert cache.is_revoked("tok")
+    assert not cache.is_revoked("other")
+
+
+def test_invalidate_one_subject():
+    cache = TokenCache()
+    cache.put("a", {"sub": "ada"})
+    cache.put("g", {"sub": "grace"})
+
+    cache.invalidate("ada")
+
+    assert cache.get("a") is None
+    assert cache.get("g") == {"sub": "grace"}
+
+
+def test_logout_revokes_the_token(client, signup):
+    auth = signup("logout-user")
+    assert client.get("/profile/", headers=auth).status_code == 200
+    assert token_cache.get(auth["Authorization"].split()[1]) is not None
+
+    assert client.post("/logout", headers=auth).status_code == 200
+
+    response = client.get("/profile/", headers=auth)
+    assert response.status_code == 401
+    assert response.json()["detail"] == "Token revoked"
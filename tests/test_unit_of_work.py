@@ -0,0 +1,57 @@
+# tests/test_unit_of_work.py
+import pytest
+
+from db.connection import get_conn
+from db.unit_of_work import UnitOfWork, after_commit, run, write
+
+
+@pytest.fixture
+def table(db):
+    db.execute("CREATE TABLE IF NOT EXISTS t_uow (x INTEGER)")
+    db.commit()
+    yield lambda: [x for x, in get_conn().execute("SELECT x FROM t_uow ORDER BY x")]
+    db.execute("DROP TABLE t_uow")
+    db.commit()
+
+
+def test_writes_land_together_on_exit(table):
+    committed = []
+    with UnitOfWork():
+        write("INSERT INTO t_uow VALUES (1)")
+        with UnitOfWork():  # joins the outer one
+            write("INSERT INTO t_uow VALUES (2)")
+        after_commit(lambda: committed.append(table()))
+        assert table() == []
+
+    assert table() == [1, 2]
+    assert committed == [[1, 2]]
+
+
+def test_exception_discards_pending_writes(table):
+    callbacks = []
+    with pytest.raises(RuntimeError):
+        with UnitOfWork():
+            write("INSERT INTO t_uow VALUES (1)")
+            after_commit(lambda: callbacks.append("ran"))
+            raise RuntimeError("turn failed")
+
+    assert table() == []
+    assert callbacks == []
+
+
+def test_failing_write_rolls_back_the_whole_unit(table):
+    with pytest.raises(Exception):
+        with UnitOfWork():
+            write("INSERT INTO t_uow VALUES (1)")
+            write("INSERT INTO no_such_table VALUES (2)")
+
+    assert table() == []
+    assert not get_conn().in_transaction
+
+
+def test_outside_a_unit_writes_commit_immediately(table):
+    done = []
+    run(lambda cur: cur.execute("INSERT INTO t_uow VALUES (3)"), lambda: done.append(True))
+
+    assert table() == [3]
+    assert done == [True]
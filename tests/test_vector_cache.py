@@ -0,0 +1,141 @@
+# tests/test_vector_cache.py
+import sys
+import threading
+
+import numpy as np
+
+from learning import memory_ranker
+from memory.vector_cache import RowFilter, UserVectors, VectorCache
+
+DIM = 16
+
+
+def _unit(rng):
+    v = rng.standard_normal(DIM).astype(np.float32)
+    return v / np.linalg.norm(v)
+
+
+def _row(i, mode="Build"):
+    return {"id": i, "role": "user", "content": f"message {i}", "created_at": "2024-01-01T00:00:00", "mode": mode}
+
+
+def test_snapshot_mask_matches_matrix_after_append():
+    rng = np.random.default_rng(0)
+    entry = UserVectors(DIM, window=0)
+    for i in range(5):
+        entry.append(_row(i), _unit(rng))
+
+    matrix, rows, mask = entry.snapshot(RowFilter(mode="Build"))
+    entry.append(_row(5), _unit(rng))
+
+    assert matrix.shape[0] == len(rows) == mask.shape[0] == 5
+
+
+def test_snapshot_mode_filter_keeps_rows_without_mode():
+    rng = np.random.default_rng(0)
+    entry = UserVectors(DIM, window=0)
+    entry.append(_row(0, "Build"), _unit(rng))
+    entry.append(_row(1, "VIP"), _unit(rng))
+    entry.append(_row(2, None), _unit(rng))
+
+    _, _, mask = entry.snapshot(RowFilter(mode="Build"))
+
+    assert mask.tolist() == [True, False, True]
+
+
+def test_filtered_search_during_concurrent_appends(monkeypatch):
+    rng = np.random.default_rng(1)
+    entry = UserVectors(DIM, window=0)
+    for i in range(5):
+        entry.append(_row(i), _unit(rng))
+    cache = VectorCache()
+    monkeypatch.setattr(memory_ranker, "vector_cache", cache)
+    cache.get(1, "space", DIM, lambda *_: entry)
+
+    vecs = [_unit(rng) for _ in range(20000)]
+    stop = threading.Event()
+
+    def writer():
+        for i, vec in enumerate(vecs, 5):
+            if stop.is_set():
+                break
+            entry.append(_row(i), vec)
+
+    # Switch threads as often as possible, so appends land between the steps
+    # of a search.
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    thread = threading.Thread(target=writer)
+    thread.start()
+    errors = []
+    try:
+        while thread.is_alive():
+            try:
+                memory_ranker.search_vectors(1, vecs[0], 8, "space", RowFilter(mode="Build"))
+            except Exception as e:
+                errors.append(e)
+                break
+    finally:
+        stop.set()
+        thread.join()
+        sys.setswitchinterval(interval)
+
+    assert errors == []
+    assert memory_ranker.search_vectors(1, vecs[0], 1, "space", RowFilter(mode="Build"))[0]["id"] == 5
+
+
+def _entry(rows, rng, dim=DIM):
+    entry = UserVectors(dim, window=0)
+    for i in range(rows):
+        entry.append(_row(i), _unit(rng))
+    return entry
+
+
+def test_cache_evicts_least_recently_used():
+    rng = np.random.default_rng(2)
+    one = _entry(10, rng)
+    cache = VectorCache(max_bytes=int(2.5 * one.nbytes))
+    for user_id in (1, 2):
+        cache.get(user_id, "space", DIM, lambda *_: _entry(10, rng))
+    cache.get(1, "space", DIM, lambda *_: None)  # hit: user 1 is now the most recent
+    cache.get(3, "space", DIM, lambda *_: _entry(10, rng))
+
+    assert cache.stats()["evictions"] == 1
+    assert {key[0] for key in cache._entries} == {1, 3}
+
+
+def test_hits_are_served_while_another_user_loads():
+    rng = np.random.default_rng(3)
+    cache = VectorCache()
+    warm = cache.get(1, "space", DIM, lambda *_: _entry(3, rng))
+    loading, release = threading.Event(), threading.Event()
+
+    def slow_loader(*_):
+        loading.set()
+        release.wait(5)
+        return _entry(3, rng)
+
+    thread = threading.Thread(target=cache.get, args=(2, "space", DIM, slow_loader))
+    thread.start()
+    try:
+        assert loading.wait(5)
+        assert cache.get(1, "space", DIM, lambda *_: None) is warm
+    finally:
+        release.set()
+        thread.join()
+
+
+def test_load_overlapping_an_append_is_not_cached():
+    rng = np.random.default_rng(4)
+    cache = VectorCache()
+
+    def loader(*_):
+        # A message is stored while the (older) history is being read.
+        cache.append(1, "space", _row(99), _unit(rng))
+        return _entry(3, rng)
+
+    first = cache.get(1, "space", DIM, loader)
+    assert first.size == 3
+    fresh = cache.get(1, "space", DIM, lambda *_: _entry(4, rng))
+    assert fresh is not first and fresh.size == 4
+    assert cache.stats()["misses"] == 2
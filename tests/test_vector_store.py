@@ -0,0 +1,36 @@
+# tests/test_vector_store.py
+import multiprocessing
+
+import numpy as np
+import pytest
+
+from memory import vector_store
+
+DIM = 8
+PER_PROCESS = 2000
+
+
+def _append_many(worker: int, queue):
+    rows = []
+    for i in range(PER_PROCESS):
+        value = worker * PER_PROCESS + i
+        rows.append((vector_store._append_to_shard(99, np.full(DIM, value, dtype=np.float32)), value))
+    queue.put(rows)
+
+
+@pytest.mark.skipif(vector_store.fcntl is None, reason="needs fcntl")
+def test_shard_rows_are_unique_across_processes():
+    ctx = multiprocessing.get_context("fork")
+    queue = ctx.Queue()
+    procs = [ctx.Process(target=_append_many, args=(w, queue)) for w in range(8)]
+    for p in procs:
+        p.start()
+    results = [row for _ in procs for row in queue.get(timeout=60)]
+    for p in procs:
+        p.join()
+
+    shard = vector_store.open_shard(99, DIM)
+    assert shard.shape[0] == len(results) == 8 * PER_PROCESS
+    assert len({row for row, _ in results}) == len(results)
+    for row, value in results:
+        assert (shard[row] == value).all()
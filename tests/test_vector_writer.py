@@ -0,0 +1,34 @@
+# tests/test_vector_writer.py
+from learning.embedder import embedding_space
+from workers import vector_writer as vw
+from workers.vector_writer import VectorWriter
+
+
+def _stored(db):
+    return db.execute("SELECT content, embedding_model, mode FROM memory_messages ORDER BY id").fetchall()
+
+
+def test_submitted_messages_are_stored_once_drained(db):
+    writer = VectorWriter(batch_size=4)
+    try:
+        for i in range(10):
+            writer.submit(1, "user", f"note number {i}", "Build")
+        assert writer.drain(timeout=10)
+    finally:
+        writer.stop()
+
+    rows = _stored(db)
+    assert [content for content, _, _ in rows] == [f"note number {i}" for i in range(10)]
+    assert all(model == embedding_space() and mode == "Build" for _, model, mode in rows)
+
+
+def test_full_queue_writes_inline_instead_of_dropping(db, monkeypatch):
+    monkeypatch.setattr(vw, "VECTOR_QUEUE_PUT_TIMEOUT", 0.01)
+    writer = VectorWriter(maxsize=1)
+    writer.start = lambda: None  # no consumer: the queue stays full
+    writer._queue.put_nowait(("placeholder",))
+
+    writer.submit(1, "user", "written inline", None)
+
+    assert [content for content, _, _ in _stored(db)] == ["written inline"]
+    assert writer._queue.qsize() == 1
@@ -0,0 +1,183 @@
+# workers/backfill.py
+"""
+Resumable re-embedding of memory_messages.
+
+Rows whose embedding_model/embedding_version differ from the current space
+(see learning.embedder.embedding_space and EMBED_VERSION), including rows
+stored without a vector after an API failure, are re-embedded in batches of
+BACKFILL_BATCH_SIZE and rewritten in place. Progress is checkpointed by row id
+in backfill_state (see db.migrations) after every batch, so a restart resumes where it stopped;
+the job name includes the space and version, so changing either starts over.
+
+The checkpoint never moves past a row that could not be embedded in the
+current space (API failure, or only EMBED_FALLBACK succeeded): the job backs
+off for BACKFILL_RETRY_SECONDS and retries from there. Rows with blank content
+cannot be embedded at all and are skipped.
+
+The embeddings API rejects a whole request if one input is invalid (e.g. over
+the token limit), so the failed rows of a batch are retried one at a time. A
+row that fails alone while the API is up (another row embedded, or a probe
+request succeeds) counts a failed attempt; after BACKFILL_MAX_ATTEMPTS it is
+given up and skipped, and the checkpoint moves past it. During an outage
+nothing is counted. Attempt counts live in this process only.
+"""
+import os
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+from db.connection import get_conn
+from workers.logger import log_system_event
+
+BACKFILL_ENABLED = os.getenv("BACKFILL_ENABLED", "1") == "1"
+BACKFILL_BATCH_SIZE = int(os.getenv("BACKFILL_BATCH_SIZE", "256"))
+# Pause between batches, to leave API quota for live traffic.
+BACKFILL_PAUSE_SECONDS = float(os.getenv("BACKFILL_PAUSE_SECONDS", "0.5"))
+# Wait before retrying rows that failed to embed (e.g. during an API outage).
+BACKFILL_RETRY_SECONDS = float(os.getenv("BACKFILL_RETRY_SECONDS", "60"))
+# Failed attempts (on its own, with the API up) before a row is skipped.
+BACKFILL_MAX_ATTEMPTS = int(os.getenv("BACKFILL_MAX_ATTEMPTS", "3"))
+
+
+class EmbeddingBackfill:
+    def __init__(self, batch_size: int = BACKFILL_BATCH_SIZE, pause: float = BACKFILL_PAUSE_SECONDS,
+                 retry_wait: float = BACKFILL_RETRY_SECONDS, max_attempts: int = BACKFILL_MAX_ATTEMPTS):
+        self.batch_size = batch_size
+        self.pause = pause
+        self.retry_wait = retry_wait
+        self.max_attempts = max_attempts
+        # row id -> failed attempts of that row on its own
+        self._attempts: Dict[int, int] = {}
+        # Set by run_batch when some rows failed and the checkpoint stopped before them.
+        self.stalled = False
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.updated = 0
+        self.skipped = 0
+
+    @staticmethod
+    def job_name(space: str, version: int) -> str:
+        return f"reembed:{space}:{version}"
+
+    def _checkpoint(self, job: str) -> int:
+        conn = get_conn()
+        cur = conn.cursor()
+        cur.execute("SELECT last_id FROM backfill_state WHERE job=?", (job,))
+        row = cur.fetchone()
+        return row[0] if row else 0
+
+    def _save_checkpoint(self, job: str, last_id: int):
+        conn = get_conn()
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO backfill_state (job, last_id, updated_at) VALUES (?, ?, ?)",
+                (job, last_id, datetime.utcnow().isoformat()),
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    def run_batch(self) -> bool:
+        """Re-embed the next batch. False once there is nothing left to do."""
+        from learning.embedder import EMBED_VERSION, embed_texts_with_model, embedding_space
+        from memory.vector_store import update_message_embeddings
+
+        space = embedding_space()
+        job = self.job_name(space, EMBED_VERSION)
+        last_id = self._checkpoint(job)
+
+        conn = get_conn()
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT id, user_id, content
+            FROM memory_messages
+            WHERE id > ?
+            AND (embedding_model IS NULL OR embedding_model != ? OR embedding_version IS NOT ?)
+            ORDER BY id
+            LIMIT ?
+        """, (last_id, space, EMBED_VERSION, self.batch_size))
+        rows = cur.fetchall()
+        if not rows:
+            return False
+
+        embedded = embed_texts_with_model([content or "" for _, _, content in rows])
+        failed = [i for i, ((_, _, content), (vec, model)) in enumerate(zip(rows, embedded))
+                  if not (vec and model == space) and (content or "").strip()]
+        given_up = self._retry_alone(rows, embedded, failed, space) if failed else set()
+
+        # Vectors from EMBED_FALLBACK (or failures) are not stored under the
+        # wrong space; the checkpoint stops before the first such row so it
+        # is retried.
+        updates = []
+        first_failed = None
+        for i, ((_id, user_id, content), (vec, model)) in enumerate(zip(rows, embedded)):
+            if vec and model == space:
+                updates.append((_id, user_id, vec))
+            elif not (content or "").strip() or i in given_up:
+                self.skipped += 1
+            elif first_failed is None:
+                first_failed = i
+        update_message_embeddings(updates, space, EMBED_VERSION)
+        self.updated += len(updates)
+
+        self.stalled = first_failed is not None
+        done = rows if first_failed is None else rows[:first_failed]
+        if done:
+            self._save_checkpoint(job, done[-1][0])
+        return True
+
+    def _retry_alone(self, rows: List[Tuple[int, int, str]], embedded: List[Tuple[list, str]],
+                     failed: List[int], space: str) -> Set[int]:
+        """
+        Re-embed the failed rows one at a time, filling `embedded` in place.
+        Stops at the first row that fails alone; returns the rows given up.
+        """
+        from learning.embedder import backend, embed_texts_with_model
+
+        blocked = None
+        for i in failed:
+            vec, model = embed_texts_with_model([rows[i][2]])[0]
+            if not (vec and model == space):
+                blocked = i
+                break
+            embedded[i] = (vec, model)
+        if blocked is None:
+            return set()
+        # Bypasses the embedding cache, so it really reaches the API.
+        api_up = any(vec and model == space for vec, model in embedded) or bool(backend.embed(["ping"])[0])
+        if not api_up:
+            # An outage, not a bad row. Retry later.
+            return set()
+
+        row_id = rows[blocked][0]
+        attempts = self._attempts[row_id] = self._attempts.get(row_id, 0) + 1
+        if attempts < self.max_attempts:
+            return set()
+        del self._attempts[row_id]
+        log_system_event(f"Embedding backfill: giving up on message {row_id} after {attempts} attempts.")
+        return {blocked}
+
+    def run(self):
+        log_system_event("Embedding backfill started.")
+        try:
+            while not self._stop.is_set() and self.run_batch():
+                self._stop.wait(self.retry_wait if self.stalled else self.pause)
+        except Exception as e:
+            log_system_event(f"Embedding backfill stopped: {e}")
+            return
+        log_system_event(f"Embedding backfill finished: {self.updated} re-embedded, {self.skipped} skipped.")
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run, name="embedding-backfill", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = 5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+embedding_backfill = EmbeddingBackfill()
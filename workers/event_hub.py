@@ -0,0 +1,142 @@
+# workers/event_hub.py
+"""
+In-process pub/sub of per-user events (fired reminders) for GET /events.
+
+publish() may be called from any thread (the reminder scheduler runs in its
+own); subscribers are asyncio queues owned by the /events stream, fed through
+their event loop. Every event gets an increasing id and is also kept in a
+bounded per-user buffer (EVENT_BUFFER_SIZE), so:
+
+- a client reconnecting with Last-Event-ID is replayed what it missed;
+- a client connecting without one is replayed whatever arrived while no
+  stream of that user was connected.
+
+Events live in this process only: a client connected to another worker does
+not see them.
+"""
+import asyncio
+import itertools
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional, Set
+
+EVENT_BUFFER_SIZE = int(os.getenv("EVENT_BUFFER_SIZE", "100"))
+# Users whose buffers are kept; the least recently active are dropped.
+EVENT_HUB_MAX_USERS = int(os.getenv("EVENT_HUB_MAX_USERS", "10000"))
+
+
+class Subscription:
+    def __init__(self, user_id: int, loop: asyncio.AbstractEventLoop):
+        self.user_id = user_id
+        self.loop = loop
+        # None marks the end of the stream (lagging too far, or shutdown).
+        self.queue: "asyncio.Queue[Optional[Dict[str, Any]]]" = asyncio.Queue()
+        self.closed = False
+
+
+class _UserEvents:
+    def __init__(self, size: int):
+        self.buffer: Deque[Dict[str, Any]] = deque(maxlen=size)
+        self.delivered = 0  # id of the last event handed to a live subscriber
+        self.subscribers: Set[Subscription] = set()
+
+
+class EventHub:
+    def __init__(self, buffer_size: int = EVENT_BUFFER_SIZE, max_users: int = EVENT_HUB_MAX_USERS):
+        self.buffer_size = buffer_size
+        self.max_users = max_users
+        self._users: "OrderedDict[int, _UserEvents]" = OrderedDict()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _user(self, user_id: int) -> _UserEvents:
+        entry = self._users.get(user_id)
+        if entry is None:
+            entry = self._users[user_id] = _UserEvents(self.buffer_size)
+        self._users.move_to_end(user_id)
+        while len(self._users) > self.max_users:
+            oldest = next(iter(self._users))
+            if self._users[oldest].subscribers:
+                self._users.move_to_end(oldest)
+                break
+            del self._users[oldest]
+        return entry
+
+    def publish(self, user_id: int, event_type: str, data: Dict[str, Any]) -> int:
+        """Buffer an event for user_id and push it to their live streams; returns its id."""
+        with self._lock:
+            event = {"id": next(self._ids), "type": event_type, "data": data, "ts": time.time()}
+            entry = self._user(user_id)
+            entry.buffer.append(event)
+            for sub in list(entry.subscribers):
+                self._push(entry, sub, event)
+            return event["id"]
+
+    def _push(self, entry: _UserEvents, sub: Subscription, event: Optional[Dict[str, Any]]):
+        if sub.closed:
+            return
+        if event is not None and sub.queue.qsize() >= self.buffer_size:
+            # Too far behind: end the stream; the client reconnects with
+            # Last-Event-ID and is replayed from the buffer.
+            event = None
+        try:
+            sub.loop.call_soon_threadsafe(sub.queue.put_nowait, event)
+        except RuntimeError:
+            # Its event loop is closed.
+            event = None
+        if event is None:
+            sub.closed = True
+            entry.subscribers.discard(sub)
+        else:
+            entry.delivered = event["id"]
+
+    def subscribe(self, user_id: int, last_event_id: Optional[int] = None) -> Subscription:
+        """
+        Open a stream for user_id from the running event loop, queued with the
+        buffered events after last_event_id (default: those never delivered).
+        """
+        sub = Subscription(user_id, asyncio.get_running_loop())
+        with self._lock:
+            entry = self._user(user_id)
+            after = entry.delivered if last_event_id is None else last_event_id
+            for event in entry.buffer:
+                if event["id"] > after:
+                    sub.queue.put_nowait(event)
+                    entry.delivered = max(entry.delivered, event["id"])
+            entry.subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        with self._lock:
+            sub.closed = True
+            entry = self._users.get(sub.user_id)
+            if entry is not None:
+                entry.subscribers.discard(sub)
+
+    def pending(self, user_id: int) -> List[Dict[str, Any]]:
+        """Buffered events of user_id not yet delivered to any stream."""
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is None:
+                return []
+            return [e for e in entry.buffer if e["id"] > entry.delivered]
+
+    def close_all(self):
+        """End every open stream (app shutdown)."""
+        with self._lock:
+            for entry in self._users.values():
+                for sub in list(entry.subscribers):
+                    self._push(entry, sub, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "users": len(self._users),
+                "subscribers": sum(len(e.subscribers) for e in self._users.values()),
+                "buffered": sum(len(e.buffer) for e in self._users.values()),
+            }
+
+
+event_hub = EventHub()
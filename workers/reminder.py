@@ -1,52 +1,117 @@
 # workers/reminder.py
+"""
+Event-driven reminder scheduler.
+
+Keeps a min-heap of the due_epoch of the next REMINDER_PREFETCH pending
+reminders across all users and sleeps until the earliest is due. ReminderService.add_reminder and
+delete_reminder call notify() (after their write commits), which reloads the
+heap, so a new reminder fires on time without polling. With nothing due the
+thread only wakes every REMINDER_MAX_SLEEP_SECONDS, to pick up reminders
+written by other processes.
+
+When something is due, one set-based sweep (ReminderService.take_due_reminders)
+claims every due reminder across all users, so its cost follows the number of
+due rows and each reminder fires once even with several workers. Fired
+reminders are published to workers.event_hub for GET /events. Reminders
+more than REMINDER_EXPIRY_SECONDS overdue (e.g. after downtime) are dropped
+unfired by the same sweep.
+"""
+import heapq
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
 from memory.long_term import ReminderService
-from datetime import datetime, timedelta
-
-EXECUTION_WINDOW_SECONDS = 60
-KEEP_AFTER_EXECUTION_DEFAULT = False
-
-def _parse_time(time_str: str):
-    try:
-        return datetime.fromisoformat(time_str)
-    except Exception:
-        return None
-
-def get_due_reminders(user_id: int):
-    now = datetime.utcnow()
-    due = []
-
-    reminders = ReminderService.list_reminders(user_id)
-    for r_id, text, time_str, status, sort_time in reminders:
-        if not time_str:
-            continue
-        reminder_time = _parse_time(time_str)
-        if not reminder_time:
-            continue
-
-        delta = (reminder_time - now).total_seconds()
-        if 0 <= delta <= EXECUTION_WINDOW_SECONDS:
-            due.append((r_id, text, reminder_time))
-
-    return due
-
-def execute_due_reminders(user_id: int, keep_after_execution: bool = KEEP_AFTER_EXECUTION_DEFAULT):
-    due_reminders = get_due_reminders(user_id)
-    for r_id, text, reminder_time in due_reminders:
-        print(f"[Reminder] User {user_id}: {text} @ {reminder_time.isoformat()}")
-        if not keep_after_execution:
-            ReminderService.delete_reminder(r_id)
-
-def clear_expired_reminders(user_id: int, keep_after_execution: bool = KEEP_AFTER_EXECUTION_DEFAULT):
-    if keep_after_execution:
-        return
-
-    now = datetime.utcnow()
-    expiry_threshold = now - timedelta(hours=1)
-
-    reminders = ReminderService.list_reminders(user_id)
-    for r_id, text, time_str, status, sort_time in reminders:
-        if not time_str:
-            continue
-        reminder_time = _parse_time(time_str)
-        if reminder_time and reminder_time < expiry_threshold:
-            ReminderService.delete_reminder(r_id)
+from workers.event_hub import event_hub
+from workers.logger import log_system_event
+
+REMINDER_PREFETCH = int(os.getenv("REMINDER_PREFETCH", "256"))
+REMINDER_MAX_SLEEP_SECONDS = float(os.getenv("REMINDER_MAX_SLEEP_SECONDS", "300"))
+REMINDER_EXPIRY_SECONDS = float(os.getenv("REMINDER_EXPIRY_SECONDS", str(60 * 60)))
+
+# (due epoch, id)
+Entry = Tuple[float, int]
+
+
+class ReminderScheduler:
+    def __init__(self, prefetch: int = REMINDER_PREFETCH, max_sleep: float = REMINDER_MAX_SLEEP_SECONDS):
+        self.prefetch = prefetch
+        self.max_sleep = max_sleep
+        self._heap: List[Entry] = []
+        # False when the last load hit the prefetch limit (more are pending).
+        self._complete = True
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.fired = 0
+        self.expired = 0
+
+    def notify(self):
+        """Reminders changed: reload before the next sleep."""
+        if threading.current_thread() is not self._thread:
+            self._wake.set()
+
+    def _load(self):
+        rows = ReminderService.upcoming_reminders(self.prefetch)
+        # Already in due order.
+        self._heap = [(due, r_id) for r_id, _, _, due, _ in rows]
+        self._complete = len(rows) < self.prefetch
+
+    def run_due(self) -> Optional[float]:
+        """Fire everything due; seconds until the next reminder (None if none is loaded)."""
+        now = time.time()
+        if self._heap and self._heap[0][0] <= now:
+            for r_id, user_id, text, due, keep in ReminderService.take_due_reminders(now):
+                if now - due > REMINDER_EXPIRY_SECONDS:
+                    self.expired += 1
+                    continue
+                due_at = datetime.fromtimestamp(due, timezone.utc).isoformat()
+                log_system_event(f"Reminder fired for user {user_id} (id {r_id}) @ {due_at}")
+                event_hub.publish(user_id, "reminder", {"id": r_id, "text": text, "time": due_at})
+                self.fired += 1
+            while self._heap and self._heap[0][0] <= now:
+                heapq.heappop(self._heap)
+        if not self._heap and not self._complete:
+            # The heap held only a prefix of the pending reminders; once it is
+            # drained, load the next ones.
+            self._load()
+            if self._heap and self._heap[0][0] <= now:
+                return 0.0
+        return self._heap[0][0] - now if self._heap else None
+
+    def run(self):
+        log_system_event("Reminder scheduler started.")
+        self._wake.set()
+        while not self._stop.is_set():
+            try:
+                if self._wake.is_set():
+                    self._wake.clear()
+                    self._load()
+                delay = self.run_due()
+            except Exception as e:
+                log_system_event(f"Reminder scheduler error: {e}")
+                delay = self.max_sleep
+            if delay is None or delay > self.max_sleep:
+                delay = self.max_sleep
+            if delay > 0 and self._wake.wait(delay):
+                continue
+            if delay >= self.max_sleep and not self._wake.is_set():
+                # Periodic refresh for reminders written by other processes.
+                self._wake.set()
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run, name="reminder-scheduler", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = 5.0):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+reminder_scheduler = ReminderScheduler()
@@ -0,0 +1,105 @@
+# workers/vector_writer.py
+"""
+Write-behind pipeline for conversation vectors.
+
+Request handlers submit (user_id, role, content, mode) and return immediately. A
+background thread drains the bounded queue in batches, embeds each batch with
+one API request and bulk-inserts it in a single transaction. When the queue
+is full, submit blocks for up to VECTOR_QUEUE_PUT_TIMEOUT seconds
+(backpressure) and then writes the message inline rather than dropping it.
+"""
+import os
+import queue
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from workers.logger import log_system_event
+
+VECTOR_QUEUE_SIZE = int(os.getenv("VECTOR_QUEUE_SIZE", "1000"))
+VECTOR_BATCH_SIZE = int(os.getenv("VECTOR_BATCH_SIZE", "64"))
+VECTOR_QUEUE_PUT_TIMEOUT = float(os.getenv("VECTOR_QUEUE_PUT_TIMEOUT", "2.0"))
+
+_STOP = object()
+
+
+class VectorWriter:
+    def __init__(self, maxsize: int = VECTOR_QUEUE_SIZE, batch_size: int = VECTOR_BATCH_SIZE):
+        self.batch_size = batch_size
+        self._queue: "queue.Queue" = queue.Queue(maxsize=maxsize)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="vector-writer", daemon=True)
+                self._thread.start()
+
+    def submit(self, user_id: int, role: str, content: str, mode: Optional[str] = None):
+        self.start()
+        item = (user_id, role, content, mode)
+        try:
+            self._queue.put(item, timeout=VECTOR_QUEUE_PUT_TIMEOUT)
+        except queue.Full:
+            self._write([item])
+
+    def drain(self, timeout: Optional[float] = None) -> bool:
+        """Block until everything submitted so far is stored. False on timeout."""
+        if timeout is None:
+            self._queue.join()
+            return True
+        done = threading.Event()
+        threading.Thread(target=lambda: (self._queue.join(), done.set()), daemon=True).start()
+        return done.wait(timeout)
+
+    def stop(self, timeout: Optional[float] = 10.0):
+        """Flush pending writes and stop the thread (shutdown hook)."""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is None or not thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        thread.join(timeout)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            batch: List[Tuple[int, str, str, Optional[str]]] = []
+            stop = item is _STOP
+            if not stop:
+                batch.append(item)
+            while not stop and len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                else:
+                    batch.append(item)
+
+            if batch:
+                self._write(batch)
+            for _ in range(len(batch) + (1 if stop else 0)):
+                self._queue.task_done()
+            if stop:
+                return
+
+    def _write(self, batch: List[Tuple[int, str, str, Optional[str]]]):
+        from learning.embedder import embed_texts_with_model
+        from memory.vector_store import add_messages
+        try:
+            embedded = embed_texts_with_model([content for _, _, content, _ in batch])
+            # Rows are grouped by the backend that embedded them (normally just
+            # one; more if some texts went to EMBED_FALLBACK).
+            by_model: Dict[str, list] = {}
+            for (user_id, role, content, mode), (vec, model) in zip(batch, embedded):
+                by_model.setdefault(model, []).append((user_id, role, content, vec, mode))
+            for model, rows in by_model.items():
+                add_messages(rows, model=model or None)
+        except Exception as e:
+            log_system_event(f"Vector writer dropped {len(batch)} message(s): {e}")
+
+
+vector_writer = VectorWriter()